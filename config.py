@@ -20,6 +20,11 @@ class Settings(BaseSettings):
     telegram_bot_token: Optional[str] = Field(None, env="TELEGRAM_BOT_TOKEN")
     telegram_chat_id: Optional[str] = Field(None, env="TELEGRAM_CHAT_ID")
     
+    # Coalescing of scheduler notifications into fewer Telegram messages
+    telegram_batch_enabled: bool = Field(True, env="TELEGRAM_BATCH_ENABLED")
+    telegram_batch_flush_interval: float = Field(3.0, env="TELEGRAM_BATCH_FLUSH_INTERVAL")
+    telegram_max_buffer_size: int = Field(20, env="TELEGRAM_MAX_BUFFER_SIZE")
+    
     # External services
     mpstats_api_key: Optional[str] = Field(None, env="MPSTATS_API_KEY")
     keys_so_api_key: Optional[str] = Field(None, env="KEYS_SO_API_KEY")
@@ -29,6 +34,14 @@ class Settings(BaseSettings):
     report_output_dir: str = Field("./reports", env="REPORT_OUTPUT_DIR")
     auto_optimization_enabled: bool = Field(False, env="AUTO_OPTIMIZATION_ENABLED")
     
+    # API response cache (seconds)
+    campaigns_cache_ttl: int = Field(300, env="CAMPAIGNS_CACHE_TTL")
+    stats_cache_ttl: int = Field(900, env="STATS_CACHE_TTL")
+    keywords_cache_ttl: int = Field(60, env="KEYWORDS_CACHE_TTL")
+    
+    # Last completed run of scheduled jobs, survives restarts
+    scheduler_state_file: str = Field("./data/scheduler_state.json", env="SCHEDULER_STATE_FILE")
+    
     # Optimization thresholds
     min_ctr_threshold: float = 0.5
     max_drr_threshold: float = 15.0
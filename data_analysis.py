@@ -1,11 +1,85 @@
 """Data analysis module for Ozon advertising campaigns."""
-import pandas as pd
-import numpy as np
+from collections import Counter
+from functools import lru_cache
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional
 from loguru import logger
 from config import settings
 
+# pandas/numpy are imported inside the methods that need them to keep
+# module import (and CLI start-up) cheap
+
+
+# Metrics used by keyword classification; missing values are treated as 0
+KEYWORD_METRIC_COLUMNS = ['ctr', 'cr', 'drr', 'clicks', 'orders', 'impressions', 'spend', 'revenue']
+
+# Rate metrics as (name, numerator, denominator), all in percent
+RATE_DEFINITIONS = (
+    ('ctr', 'clicks', 'impressions'),
+    ('cr', 'orders', 'clicks'),
+    ('drr', 'spend', 'revenue'),
+)
+
+# Keyword issue bit flags stored in the 'issue_flags' field of analyzed keywords
+ISSUE_NO_ORDERS_WITH_CLICKS = 1
+ISSUE_CRITICAL_DRR = 2
+ISSUE_LOW_CTR = 4
+ISSUE_HIGH_PERFORMANCE = 8
+ISSUE_HIGH_DRR = 16
+ISSUE_WARNING_DRR = 32
+ISSUE_LOW_CTR_HIGH_IMPRESSIONS = 64
+
+# Issue flag per classification rule id, rule 0 (keep) sets none
+RULE_ISSUE_FLAGS = (
+    0,
+    ISSUE_NO_ORDERS_WITH_CLICKS,
+    ISSUE_CRITICAL_DRR,
+    ISSUE_LOW_CTR,
+    ISSUE_HIGH_PERFORMANCE,
+    ISSUE_HIGH_DRR,
+    ISSUE_WARNING_DRR,
+    ISSUE_LOW_CTR_HIGH_IMPRESSIONS,
+)
+
+# Columns summed into campaign-level totals
+SUMMARY_TOTAL_COLUMNS = ['spend', 'revenue', 'clicks', 'impressions', 'orders']
+
+# Metrics checked for trends over time
+TREND_METRIC_COLUMNS = ['ctr', 'cr', 'drr', 'spend', 'revenue']
+
+
+@lru_cache(maxsize=None)
+def _numba_classifier():
+    """Compile the keyword classification kernel, or return None without Numba."""
+    try:
+        import numpy as np
+        from numba import njit
+    except ImportError:
+        return None
+    
+    @njit
+    def classify(ctr, cr, drr, clicks, orders, impressions, min_clicks, critical_drr,
+                 min_ctr, high_ctr, high_cr, max_acceptable_drr, max_drr):
+        rule = np.zeros(ctr.shape[0], dtype=np.int8)
+        for i in range(ctr.shape[0]):
+            if clicks[i] >= min_clicks and orders[i] == 0:
+                rule[i] = 1
+            elif drr[i] > critical_drr:
+                rule[i] = 2
+            elif ctr[i] < min_ctr and clicks[i] > 10:
+                rule[i] = 3
+            elif ctr[i] > high_ctr and cr[i] > high_cr and max_acceptable_drr > drr[i] > 0:
+                rule[i] = 4
+            elif max_drr < drr[i] <= critical_drr:
+                rule[i] = 5
+            elif drr[i] > max_drr:
+                rule[i] = 6
+            elif impressions[i] > 1000 and ctr[i] < 1.0:
+                rule[i] = 7
+        return rule
+    
+    return classify
+
 
 class CampaignAnalyzer:
     """Analyzer for campaign performance metrics."""
@@ -19,115 +93,257 @@ class CampaignAnalyzer:
         self.max_acceptable_drr = settings.max_acceptable_drr
         self.critical_drr_threshold = settings.critical_drr_threshold
         self.min_clicks_for_analysis = settings.min_clicks_for_analysis
+        self.bid_increase_percent = float(settings.bid_increase_percent)
+        self.bid_decrease_percent = float(settings.bid_decrease_percent)
+        
+        # Recommendations that do not depend on keyword metrics
+        self._rec_increase_bid = f'📈 ПОВЫСИТЬ СТАВКУ на {self.bid_increase_percent}%: отличные показатели'
     
     def analyze_keywords(self, keyword_stats: List[Dict]) -> List[Dict]:
-        """Analyze keyword performance and provide recommendations."""
+        """Analyze keyword performance and provide recommendations.
+        
+        Recommendation fields are added to the given keyword dicts in place.
+        """
         logger.info(f"Analyzing {len(keyword_stats)} keywords")
         
+        if not keyword_stats:
+            logger.info("Analysis complete. Found 0 keywords needing attention")
+            return []
+        
+        import numpy as np
+        import pandas as pd
+        
+        # Single columnar pass instead of per-keyword branching
+        df = pd.DataFrame(keyword_stats).reindex(columns=KEYWORD_METRIC_COLUMNS)
+        missing_rates = self._compute_rates(df)
+        
+        ctr, drr, clicks = df['ctr'], df['drr'], df['clicks']
+        rule = self._classify_keywords(df)
+        
+        actions = np.array(['keep', 'pause', 'pause', 'pause', 'increase_bid',
+                            'decrease_bid', 'monitor', 'monitor'], dtype=object)[rule]
+        priorities = np.array([0, 100, 95, 90, 70, 60, 30, 20], dtype=np.int8)[rule]
+        issue_flags = np.array(RULE_ISSUE_FLAGS, dtype=np.uint8)[rule]
+        bid_adjustments = np.array([0, 0, 0, 0, self.bid_increase_percent,
+                                    -self.bid_decrease_percent, 0, 0], dtype=object)[rule]
+        
+        recommendations = pd.Series('Продолжать мониторинг', index=df.index, dtype=object)
+        formatters = {
+            1: (clicks.astype('int64'), '🔴 ОТКЛЮЧИТЬ: {} кликов без заказов'),
+            2: (drr, '🔴 ОТКЛЮЧИТЬ: ДРР {:.1f}% критически высокий'),
+            3: (ctr, '🔴 ОТКЛЮЧИТЬ: CTR {:.2f}% слишком низкий'),
+            5: (drr, f'📉 ПОНИЗИТЬ СТАВКУ на {self.bid_decrease_percent}%: высокий ДРР {{:.1f}}%'),
+            6: (drr, '⚠️ МОНИТОРИТЬ: ДРР {:.1f}% превышает норму'),
+            7: (ctr, '⚠️ МОНИТОРИТЬ: низкий CTR {:.2f}% при высоких показах'),
+        }
+        for rule_id, (values, template) in formatters.items():
+            mask = rule == rule_id
+            if mask.any():
+                recommendations[mask] = values[mask].map(template.format)
+        recommendations[rule == 4] = self._rec_increase_bid
+        
+        # Sort by priority (critical issues first), stable like list.sort
+        order = np.argsort(-priorities, kind='stable')
+        recommendations = recommendations.to_numpy()
+        
+        # Results (and rates derived from counters) are written into the keyword dicts in place
+        derived_rates = {rate: df[rate].tolist() for rate in missing_rates}
         analyzed_keywords = []
-        
-        for keyword_data in keyword_stats:
-            analysis = self._analyze_single_keyword(keyword_data)
+        for i in order:
+            analysis = keyword_stats[i]
+            analysis['action'] = actions[i]
+            analysis['recommendation'] = recommendations[i]
+            analysis['priority'] = int(priorities[i])
+            analysis['issue_flags'] = int(issue_flags[i])
+            analysis['bid_adjustment'] = bid_adjustments[i]
+            for rate, values in derived_rates.items():
+                if analysis.get(rate) is None:
+                    analysis[rate] = values[i]
             analyzed_keywords.append(analysis)
         
-        # Sort by priority (critical issues first)
-        analyzed_keywords.sort(key=lambda x: x['priority'], reverse=True)
-        
-        logger.info(f"Analysis complete. Found {len([k for k in analyzed_keywords if k['action'] != 'keep'])} keywords needing attention")
+        logger.info(f"Analysis complete. Found {int((rule != 0).sum())} keywords needing attention")
         return analyzed_keywords
     
+    @staticmethod
+    def _compute_rates(df) -> List[str]:
+        """Fill missing ctr/cr/drr from raw counters and zero-fill the rest.
+        
+        Division by a zero denominator gives 0. Returns the names of the rates
+        that had missing values.
+        """
+        import numpy as np
+        
+        counters = [column for column in KEYWORD_METRIC_COLUMNS
+                    if column not in ('ctr', 'cr', 'drr')]
+        df[counters] = df[counters].fillna(0)
+        
+        missing_rates = []
+        for rate, numerator, denominator in RATE_DEFINITIONS:
+            missing = df[rate].isna().to_numpy()
+            if not missing.any():
+                continue
+            missing_rates.append(rate)
+            num = df[numerator].to_numpy(dtype=np.float64)
+            den = df[denominator].to_numpy(dtype=np.float64)
+            computed = np.divide(num, den, out=np.zeros_like(num), where=den > 0) * 100
+            df[rate] = np.where(missing, computed, df[rate].to_numpy(dtype=np.float64))
+        
+        return missing_rates
+    
+    def _classify_keywords(self, df) -> "np.ndarray":
+        """Return the number of the matching rule (0 = keep) for every keyword row.
+        
+        Rules mirror the if/elif chain of _analyze_single_keyword. Uses a
+        compiled Numba kernel when Numba is installed, np.select otherwise.
+        """
+        import numpy as np
+        
+        columns = [df[name].to_numpy(dtype=np.float64)
+                   for name in ('ctr', 'cr', 'drr', 'clicks', 'orders', 'impressions')]
+        thresholds = (
+            self.min_clicks_for_analysis, self.critical_drr_threshold, self.min_ctr_threshold,
+            self.high_ctr_threshold, self.high_cr_threshold, self.max_acceptable_drr,
+            self.max_drr_threshold
+        )
+        
+        kernel = _numba_classifier()
+        if kernel is not None:
+            return kernel(*columns, *(float(t) for t in thresholds))
+        
+        ctr, cr, drr, clicks, orders, impressions = columns
+        (min_clicks, critical_drr, min_ctr, high_ctr, high_cr,
+         max_acceptable_drr, max_drr) = thresholds
+        
+        # np.select picks the first matching condition
+        conditions = [
+            (clicks >= min_clicks) & (orders == 0),
+            drr > critical_drr,
+            (ctr < min_ctr) & (clicks > 10),
+            (ctr > high_ctr) & (cr > high_cr) & (drr < max_acceptable_drr) & (drr > 0),
+            (drr > max_drr) & (drr <= critical_drr),
+            drr > max_drr,
+            (impressions > 1000) & (ctr < 1.0),
+        ]
+        return np.select(conditions, np.arange(1, len(conditions) + 1, dtype=np.int8), default=0)
+    
     def _analyze_single_keyword(self, keyword_data: Dict) -> Dict:
-        """Analyze single keyword and provide recommendation."""
-        keyword = keyword_data.get('keyword', '')
+        """Analyze single keyword and add recommendation fields to it in place."""
         ctr = keyword_data.get('ctr', 0)
         cr = keyword_data.get('cr', 0)
         drr = keyword_data.get('drr', 0)
         clicks = keyword_data.get('clicks', 0)
         orders = keyword_data.get('orders', 0)
         impressions = keyword_data.get('impressions', 0)
-        spend = keyword_data.get('spend', 0)
-        
-        analysis = {
-            **keyword_data,
-            'action': 'keep',
-            'recommendation': 'Продолжать мониторинг',
-            'priority': 0,
-            'issues': [],
-            'bid_adjustment': 0
-        }
+        
+        # Fill in the result fields on keyword_data itself
+        analysis = keyword_data
+        analysis['action'] = 'keep'
+        analysis['recommendation'] = 'Продолжать мониторинг'
+        analysis['priority'] = 0
+        analysis['issue_flags'] = 0
+        analysis['bid_adjustment'] = 0
+        
+        # Shared checks, evaluated once
+        no_orders = clicks >= self.min_clicks_for_analysis and orders == 0
+        critical_drr = drr > self.critical_drr_threshold
+        high_drr = drr > self.max_drr_threshold
+        low_ctr = ctr < self.min_ctr_threshold and clicks > 10
+        high_performance = (ctr > self.high_ctr_threshold and
+                            cr > self.high_cr_threshold and
+                            self.max_acceptable_drr > drr > 0)
+        low_ctr_high_impressions = impressions > 1000 and ctr < 1.0
+        
+        # Most keywords need no action
+        if not (no_orders or critical_drr or high_drr or low_ctr or
+                high_performance or low_ctr_high_impressions):
+            return analysis
         
         # Critical issues (highest priority)
-        if clicks >= self.min_clicks_for_analysis and orders == 0:
+        if no_orders:
             analysis['action'] = 'pause'
             analysis['recommendation'] = f'🔴 ОТКЛЮЧИТЬ: {clicks} кликов без заказов'
             analysis['priority'] = 100
-            analysis['issues'].append('no_orders_with_clicks')
+            analysis['issue_flags'] = ISSUE_NO_ORDERS_WITH_CLICKS
         
-        elif drr > self.critical_drr_threshold:
+        elif critical_drr:
             analysis['action'] = 'pause'
             analysis['recommendation'] = f'🔴 ОТКЛЮЧИТЬ: ДРР {drr:.1f}% критически высокий'
             analysis['priority'] = 95
-            analysis['issues'].append('critical_drr')
+            analysis['issue_flags'] = ISSUE_CRITICAL_DRR
         
-        elif ctr < self.min_ctr_threshold and clicks > 10:
+        elif low_ctr:
             analysis['action'] = 'pause'
             analysis['recommendation'] = f'🔴 ОТКЛЮЧИТЬ: CTR {ctr:.2f}% слишком низкий'
             analysis['priority'] = 90
-            analysis['issues'].append('low_ctr')
+            analysis['issue_flags'] = ISSUE_LOW_CTR
         
         # Optimization opportunities (medium priority)
-        elif (ctr > self.high_ctr_threshold and 
-              cr > self.high_cr_threshold and 
-              drr < self.max_acceptable_drr and
-              drr > 0):
+        elif high_performance:
             analysis['action'] = 'increase_bid'
-            analysis['bid_adjustment'] = settings.bid_increase_percent
-            analysis['recommendation'] = f'📈 ПОВЫСИТЬ СТАВКУ на {settings.bid_increase_percent}%: отличные показатели'
+            analysis['bid_adjustment'] = self.bid_increase_percent
+            analysis['recommendation'] = self._rec_increase_bid
             analysis['priority'] = 70
-            analysis['issues'].append('high_performance')
+            analysis['issue_flags'] = ISSUE_HIGH_PERFORMANCE
         
-        elif drr > self.max_drr_threshold and drr <= self.critical_drr_threshold:
+        elif high_drr and not critical_drr:
             analysis['action'] = 'decrease_bid'
-            analysis['bid_adjustment'] = -settings.bid_decrease_percent
-            analysis['recommendation'] = f'📉 ПОНИЗИТЬ СТАВКУ на {settings.bid_decrease_percent}%: высокий ДРР {drr:.1f}%'
+            analysis['bid_adjustment'] = -self.bid_decrease_percent
+            analysis['recommendation'] = f'📉 ПОНИЗИТЬ СТАВКУ на {self.bid_decrease_percent}%: высокий ДРР {drr:.1f}%'
             analysis['priority'] = 60
-            analysis['issues'].append('high_drr')
+            analysis['issue_flags'] = ISSUE_HIGH_DRR
         
         # Warning issues (low priority)
-        elif drr > self.max_drr_threshold:
+        elif high_drr:
             analysis['action'] = 'monitor'
             analysis['recommendation'] = f'⚠️ МОНИТОРИТЬ: ДРР {drr:.1f}% превышает норму'
             analysis['priority'] = 30
-            analysis['issues'].append('warning_drr')
+            analysis['issue_flags'] = ISSUE_WARNING_DRR
         
-        elif impressions > 1000 and ctr < 1.0:
+        elif low_ctr_high_impressions:
             analysis['action'] = 'monitor'
             analysis['recommendation'] = f'⚠️ МОНИТОРИТЬ: низкий CTR {ctr:.2f}% при высоких показах'
             analysis['priority'] = 20
-            analysis['issues'].append('low_ctr_high_impressions')
+            analysis['issue_flags'] = ISSUE_LOW_CTR_HIGH_IMPRESSIONS
         
         return analysis
     
+    def partition(self, keyword_analysis: List[Dict]) -> Tuple[List[Dict], List[Dict], List[Dict]]:
+        """Split analyzed keywords into (to pause, bid adjustment candidates, critical) in one pass."""
+        pause, bid_candidates, critical = [], [], []
+        for keyword in keyword_analysis:
+            if keyword.get('action') == 'pause':
+                pause.append(keyword)
+            if keyword.get('bid_adjustment', 0) != 0:
+                bid_candidates.append(keyword)
+            if keyword.get('priority', 0) >= 90:
+                critical.append(keyword)
+        return pause, bid_candidates, critical
+    
     def get_campaign_summary(self, campaign_stats: Dict, keyword_analysis: List[Dict]) -> Dict:
         """Generate campaign summary with key insights."""
+        import pandas as pd
+        
         total_keywords = len(keyword_analysis)
+        df = pd.DataFrame(keyword_analysis)
         
-        # Count actions needed
-        actions_count = {}
-        for analysis in keyword_analysis:
-            action = analysis['action']
-            actions_count[action] = actions_count.get(action, 0) + 1
+        # Count actions needed (in order of first appearance)
+        actions_count = df['action'].value_counts(sort=False).to_dict() if total_keywords else {}
         
-        # Calculate totals
-        total_spend = sum(k.get('spend', 0) for k in keyword_analysis)
-        total_revenue = sum(k.get('revenue', 0) for k in keyword_analysis)
-        total_clicks = sum(k.get('clicks', 0) for k in keyword_analysis)
-        total_impressions = sum(k.get('impressions', 0) for k in keyword_analysis)
-        total_orders = sum(k.get('orders', 0) for k in keyword_analysis)
+        # Calculate totals in a single reduction
+        totals = df.reindex(columns=SUMMARY_TOTAL_COLUMNS, fill_value=0).sum()
+        total_spend = float(totals['spend'])
+        total_revenue = float(totals['revenue'])
+        total_clicks = int(totals['clicks'])
+        total_impressions = int(totals['impressions'])
+        total_orders = int(totals['orders'])
         
         # Top performers and worst performers
-        high_performance = [k for k in keyword_analysis if 'high_performance' in k['issues']]
-        critical_issues = [k for k in keyword_analysis if k['priority'] >= 90]
+        if total_keywords:
+            is_high_performance = (df['issue_flags'] & ISSUE_HIGH_PERFORMANCE) != 0
+            top_index = df.loc[is_high_performance, 'revenue'].nlargest(5).index
+            critical_index = df.loc[df['priority'] >= 90, 'priority'].nlargest(10).index
+        else:
+            top_index = critical_index = []
         
         summary = {
             'campaign_id': campaign_stats.get('campaign_id'),
@@ -144,8 +360,8 @@ class CampaignAnalyzer:
                 'overall_drr': (total_spend / total_revenue * 100) if total_revenue > 0 else 0,
                 'overall_roi': (total_revenue / total_spend) if total_spend > 0 else 0
             },
-            'top_performers': sorted(high_performance, key=lambda x: x['revenue'], reverse=True)[:5],
-            'critical_issues': sorted(critical_issues, key=lambda x: x['priority'], reverse=True)[:10],
+            'top_performers': [keyword_analysis[i] for i in top_index],
+            'critical_issues': [keyword_analysis[i] for i in critical_index],
             'recommendations': self._generate_campaign_recommendations(keyword_analysis, actions_count)
         }
         
@@ -182,34 +398,37 @@ class CampaignAnalyzer:
         if len(historical_data) < 2:
             return {'trend': 'insufficient_data', 'message': 'Недостаточно данных для анализа трендов'}
         
+        import numpy as np
+        import pandas as pd
+        
         # Convert to DataFrame for easier analysis
         df = pd.DataFrame(historical_data)
         df['date'] = pd.to_datetime(df['date'])
         df = df.sort_values('date')
         
-        # Calculate trends for key metrics
-        trends = {}
+        # Calculate trends for all key metrics with one least-squares fit
+        metrics = [metric for metric in TREND_METRIC_COLUMNS if metric in df.columns]
+        if not metrics:
+            return {}
+        
+        values = df[metrics].to_numpy(dtype=np.float64)
+        x = np.arange(len(values))
+        slopes = np.polyfit(x, values, 1)[0]
         
-        for metric in ['ctr', 'cr', 'drr', 'spend', 'revenue']:
-            if metric in df.columns:
-                values = df[metric].values
-                if len(values) >= 2:
-                    # Simple linear trend
-                    x = np.arange(len(values))
-                    slope = np.polyfit(x, values, 1)[0]
-                    
-                    if abs(slope) < 0.01:  # Threshold for "stable"
-                        trend = 'stable'
-                    elif slope > 0:
-                        trend = 'increasing'
-                    else:
-                        trend = 'decreasing'
-                    
-                    trends[metric] = {
-                        'trend': trend,
-                        'slope': slope,
-                        'change_percent': ((values[-1] - values[0]) / values[0] * 100) if values[0] != 0 else 0
-                    }
+        first, last = values[0], values[-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change_percent = np.where(first != 0, (last - first) / first * 100, 0.0)
+        
+        # Threshold 0.01 for "stable"
+        labels = np.select([np.abs(slopes) < 0.01, slopes > 0], ['stable', 'increasing'], 'decreasing')
+        
+        trends = {}
+        for metric, trend, slope, change in zip(metrics, labels.tolist(), slopes.tolist(), change_percent.tolist()):
+            trends[metric] = {
+                'trend': trend,
+                'slope': slope,
+                'change_percent': change
+            }
         
         return trends
     
@@ -217,23 +436,24 @@ class CampaignAnalyzer:
         """Find opportunities for new keywords based on performance patterns."""
         opportunities = []
         
+        # One pass: word frequencies of high performers and short keyword presence
+        word_counts = Counter()
+        has_high_performers = False
+        has_short_keywords = False
+        
+        for k in keyword_stats:
+            keyword = k['keyword']
+            if (k.get('ctr', 0) > self.high_ctr_threshold
+                    and k.get('cr', 0) > self.high_cr_threshold
+                    and k.get('drr', 0) < self.max_acceptable_drr):
+                has_high_performers = True
+                word_counts.update(keyword.lower().split())
+            if not has_short_keywords and len(keyword.split()) <= 2:
+                has_short_keywords = True
+        
         # Analyze high-performing keywords for patterns
-        high_performers = [k for k in keyword_stats 
-                          if k.get('ctr', 0) > self.high_ctr_threshold 
-                          and k.get('cr', 0) > self.high_cr_threshold
-                          and k.get('drr', 0) < self.max_acceptable_drr]
-        
-        if high_performers:
-            # Extract common patterns
-            keywords = [k['keyword'].lower() for k in high_performers]
-            
-            # Find common words
-            all_words = []
-            for keyword in keywords:
-                all_words.extend(keyword.split())
-            
-            word_freq = pd.Series(all_words).value_counts()
-            common_words = word_freq.head(10).index.tolist()
+        if has_high_performers:
+            common_words = [word for word, _ in word_counts.most_common(10)]
             
             opportunities.append({
                 'type': 'pattern_based',
@@ -243,16 +463,14 @@ class CampaignAnalyzer:
             })
         
         # Suggest long-tail variations
-        if keyword_stats:
-            short_keywords = [k for k in keyword_stats if len(k['keyword'].split()) <= 2]
-            if short_keywords:
-                opportunities.append({
-                    'type': 'long_tail',
-                    'description': 'Длинные ключевые фразы',
-                    'suggestions': ['Добавить длинные вариации коротких ключей', 
-                                   'Использовать geo-модификаторы', 
-                                   'Добавить характеристики товара'],
-                    'priority': 'medium'
-                })
+        if has_short_keywords:
+            opportunities.append({
+                'type': 'long_tail',
+                'description': 'Длинные ключевые фразы',
+                'suggestions': ['Добавить длинные вариации коротких ключей', 
+                               'Использовать geo-модификаторы', 
+                               'Добавить характеристики товара'],
+                'priority': 'medium'
+            })
         
         return opportunities
\ No newline at end of file
@@ -1,22 +1,48 @@
 """Keyword management module for Ozon advertising campaigns."""
+import heapq
 import re
+from functools import lru_cache
 from typing import Dict, List, Set, Optional, Tuple
 import requests
 from loguru import logger
 from config import settings
 
 
+# Service words excluded from keyword generation
+STOP_WORDS = frozenset({
+    'и', 'в', 'на', 'с', 'по', 'для', 'от', 'до', 'из', 'к', 'о', 'про', 'при', 
+    'без', 'над', 'под', 'через', 'между', 'среди', 'около', 'вокруг', 'внутри',
+    'снаружи', 'сверху', 'снизу', 'спереди', 'сзади', 'слева', 'справа'
+})
+
+# Precompiled text cleanup patterns
+_RE_NONWORD_NODASH = re.compile(r'[^\w\s]')
+_RE_NONWORD_DOT = re.compile(r'[^\w\s.-]')
+# Cyrillic letters a keyword must contain at least one of
+_CYRILLIC_CHARS = frozenset('абвгдеёжзийклмнопрстуфхцчшщъыьэюя'
+                            'АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ')
+
+# Word fragments that mark low-intent searches
+_RE_NEGATIVE_PATTERN = re.compile('дешев|подделк|копи|фейк')
+
+# Common negative keywords for e-commerce
+COMMON_NEGATIVE_KEYWORDS = (
+    'бесплатно', 'скачать', 'торрент', 'взлом', 'crack',
+    'обзор', 'отзыв', 'видео', 'фото', 'картинки',
+    'вакансия', 'работа', 'резюме', 'зарплата'
+)
+
+# Suggestion priority ranks used for deduplication
+PRIORITY_ORDER = {'high': 3, 'medium': 2, 'low': 1}
+
+
 class KeywordManager:
     """Manager for keyword operations and suggestions."""
     
     def __init__(self, ozon_client=None):
         """Initialize keyword manager."""
         self.ozon_client = ozon_client
-        self.stop_words = {
-            'и', 'в', 'на', 'с', 'по', 'для', 'от', 'до', 'из', 'к', 'о', 'про', 'при', 
-            'без', 'над', 'под', 'через', 'между', 'среди', 'около', 'вокруг', 'внутри',
-            'снаружи', 'сверху', 'снизу', 'спереди', 'сзади', 'слева', 'справа'
-        }
+        self.stop_words = STOP_WORDS
     
     def suggest_keywords_from_product(self, product_info: Dict) -> List[Dict]:
         """Generate keyword suggestions based on product information."""
@@ -80,39 +106,34 @@ class KeywordManager:
         logger.info(f"Generated {len(suggestions)} keyword suggestions")
         return suggestions
     
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def _tokenize(text: str) -> Tuple[str, ...]:
+        """Split text into lowercase words without punctuation, stop words and short words."""
+        words = _RE_NONWORD_NODASH.sub(' ', text.lower()).split()
+        return tuple(w for w in words if w not in STOP_WORDS and len(w) > 2)
+    
     def _extract_keywords_from_text(self, text: str) -> List[str]:
         """Extract potential keywords from text."""
-        # Clean text
-        text = re.sub(r'[^\w\s-]', ' ', text.lower())
-        words = text.split()
-        
-        # Remove stop words
-        words = [w for w in words if w not in self.stop_words and len(w) > 2]
-        
-        keywords = []
+        words = self._tokenize(text)
         
         # Single words
-        keywords.extend(words)
+        keywords = set(words)
         
         # Two-word combinations
-        for i in range(len(words) - 1):
-            keywords.append(f"{words[i]} {words[i+1]}")
+        keywords.update(f"{a} {b}" for a, b in zip(words, words[1:]))
         
-        # Three-word combinations (selective)
-        for i in range(len(words) - 2):
-            if len(words[i]) > 3 and len(words[i+1]) > 3:  # Only meaningful words
-                keywords.append(f"{words[i]} {words[i+1]} {words[i+2]}")
+        # Three-word combinations (selective, only meaningful words)
+        keywords.update(f"{a} {b} {c}" for a, b, c in zip(words, words[1:], words[2:])
+                        if len(a) > 3 and len(b) > 3)
         
-        return list(set(keywords))
+        return list(keywords)
     
     def _generate_brand_combinations(self, brand: str, title: str) -> List[str]:
         """Generate brand + product keyword combinations."""
         combinations = []
         
-        # Clean title
-        title_words = re.sub(r'[^\w\s]', ' ', title.lower()).split()
-        title_words = [w for w in title_words if w not in self.stop_words and len(w) > 2]
-        
+        title_words = self._tokenize(title)
         brand_lower = brand.lower()
         
         # Brand + main product words
@@ -131,8 +152,8 @@ class KeywordManager:
         """Generate category-based keywords."""
         keywords = []
         
-        category_words = re.sub(r'[^\w\s]', ' ', category.lower()).split()
-        title_words = re.sub(r'[^\w\s]', ' ', title.lower()).split()
+        category_words = self._tokenize(category)
+        title_words = self._tokenize(title)
         
         # Main category words
         for cat_word in category_words:
@@ -149,14 +170,14 @@ class KeywordManager:
     def _extract_long_tail_keywords(self, description: str) -> List[str]:
         """Extract long-tail keywords from product description."""
         # Clean description
-        text = re.sub(r'[^\w\s.-]', ' ', description.lower())
+        text = _RE_NONWORD_DOT.sub(' ', description.lower())
         sentences = text.split('.')
         
         keywords = []
         
         for sentence in sentences:
             words = sentence.strip().split()
-            words = [w for w in words if w not in self.stop_words and len(w) > 2]
+            words = [w for w in words if w not in STOP_WORDS and len(w) > 2]
             
             # Extract 3-4 word phrases
             for i in range(len(words) - 2):
@@ -176,33 +197,35 @@ class KeywordManager:
     
     def _filter_and_deduplicate(self, suggestions: List[Dict]) -> List[Dict]:
         """Filter and remove duplicate keyword suggestions."""
-        seen_keywords = set()
-        filtered = []
-        
-        # Sort by priority (high first)
-        priority_order = {'high': 3, 'medium': 2, 'low': 1}
-        suggestions.sort(key=lambda x: priority_order.get(x['priority'], 0), reverse=True)
+        # Best suggestion per normalized keyword: (priority, -position, suggestion)
+        best = {}
         
-        for suggestion in suggestions:
+        for position, suggestion in enumerate(suggestions):
             keyword = suggestion['keyword'].strip().lower()
             
             # Skip if too short or too long
             if len(keyword) < 3 or len(keyword) > 100:
                 continue
             
-            # Skip if already seen
-            if keyword in seen_keywords:
-                continue
-            
             # Skip if only numbers or special characters
-            if not re.search(r'[а-яё]', keyword, re.IGNORECASE):
+            if _CYRILLIC_CHARS.isdisjoint(keyword):
                 continue
             
-            seen_keywords.add(keyword)
+            # Keep the highest priority (earliest on ties) occurrence
+            priority = PRIORITY_ORDER.get(suggestion['priority'], 0)
+            current = best.get(keyword)
+            if current is None or current[0] < priority:
+                best[keyword] = (priority, -position, suggestion)
+        
+        # Top 50 by priority (high first), original order within a priority
+        top = heapq.nlargest(50, best.items(), key=lambda item: item[1][:2])
+        
+        filtered = []
+        for keyword, (_, _, suggestion) in top:
             suggestion['keyword'] = keyword
             filtered.append(suggestion)
         
-        return filtered[:50]  # Limit to top 50
+        return filtered
     
     def generate_negative_keywords(self, poor_performing_keywords: List[Dict]) -> List[str]:
         """Generate negative keywords based on poor performers."""
@@ -212,33 +235,24 @@ class KeywordManager:
         
         for keyword_data in poor_performing_keywords:
             keyword = keyword_data.get('keyword', '').lower()
+            clicks = keyword_data.get('clicks', 0)
             
-            # Extract problematic words
-            words = keyword.split()
+            # If keyword has very low CTR, consider words as negative
+            very_low_ctr = keyword_data.get('ctr', 0) < 0.1 and clicks > 20
             
             # Add single problematic words
-            for word in words:
+            for word in keyword.split():
                 if len(word) > 3:
                     # Common negative patterns
-                    if any(pattern in word for pattern in ['дешев', 'подделк', 'копи', 'фейк']):
-                        negative_keywords.add(word)
-                    
-                    # If keyword has very low CTR, consider words as negative
-                    if keyword_data.get('ctr', 0) < 0.1 and keyword_data.get('clicks', 0) > 20:
+                    if very_low_ctr or _RE_NEGATIVE_PATTERN.search(word):
                         negative_keywords.add(word)
             
             # Add full phrases for very poor performers
-            if (keyword_data.get('clicks', 0) > 50 and 
-                keyword_data.get('orders', 0) == 0):
+            if clicks > 50 and keyword_data.get('orders', 0) == 0:
                 negative_keywords.add(keyword)
         
         # Add common negative keywords for e-commerce
-        common_negatives = [
-            'бесплатно', 'скачать', 'торрент', 'взлом', 'crack',
-            'обзор', 'отзыв', 'видео', 'фото', 'картинки',
-            'вакансия', 'работа', 'резюме', 'зарплата'
-        ]
-        negative_keywords.update(common_negatives)
+        negative_keywords.update(COMMON_NEGATIVE_KEYWORDS)
         
         result = list(negative_keywords)[:100]  # Limit to 100
         logger.info(f"Generated {len(result)} negative keywords")
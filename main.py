@@ -1,15 +1,23 @@
 """Main entry point for Ozon Ads Bot."""
 import asyncio
 import os
+import signal
 import sys
+import threading
 from datetime import datetime, timedelta
+from functools import lru_cache
+from operator import itemgetter
 from typing import Optional
 import click
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
 from loguru import logger
 
 # Import our modules
 from config import settings
-from ozon_api import OzonAPIClient
+from ozon_api import OzonAPIClient, AsyncOzonAPIClient, OzonAPIError, format_api_date
 from data_analysis import CampaignAnalyzer
 from keyword_manager import KeywordManager
 from report_generator import ReportGenerator
@@ -17,15 +25,23 @@ from scheduler import CampaignScheduler
 from telegram_bot import TelegramBot
 
 
+# (keyword, action) of an analyzed keyword in one C-level lookup
+_get_keyword_action = itemgetter('keyword', 'action')
+
+
 class OzonAdsBot:
     """Main bot class that coordinates all components."""
     
+    __slots__ = ("ozon_client", "async_client", "analyzer", "keyword_manager",
+                 "report_generator", "scheduler", "telegram_bot")
+    
     def __init__(self):
         """Initialize the bot with all components."""
         logger.info("Initializing Ozon Ads Bot")
         
         # Initialize components
         self.ozon_client = OzonAPIClient()
+        self.async_client = AsyncOzonAPIClient(cache=self.ozon_client.cache)
         self.analyzer = CampaignAnalyzer()
         self.keyword_manager = KeywordManager(self.ozon_client)
         self.report_generator = ReportGenerator()
@@ -56,6 +72,8 @@ class OzonAdsBot:
             self.scheduler.add_callback('on_analysis_complete', self.telegram_bot.notify_analysis_complete)
             self.scheduler.add_callback('on_optimization_complete', self.telegram_bot.notify_optimization_complete)
             self.scheduler.add_callback('on_critical_issue', self.telegram_bot.notify_critical_issue)
+            self.scheduler.add_callback('on_alert', self.telegram_bot.notify_monitoring_alerts)
+            self.scheduler.add_callback('on_stop', self.telegram_bot.flush_pending)
     
     def start_scheduler(self):
         """Start the scheduler."""
@@ -69,16 +87,16 @@ class OzonAdsBot:
         else:
             logger.warning("Telegram bot not configured")
     
-    def analyze_campaign(self, campaign_id: str, days: int = 7) -> dict:
+    def analyze_campaign(self, campaign_id: int, days: int = 7) -> dict:
         """Analyze specific campaign."""
         logger.info(f"Analyzing campaign {campaign_id}")
         
-        date_to = datetime.now().strftime('%Y-%m-%d')
-        date_from = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+        now = datetime.now()
+        date_to = format_api_date(now)
+        date_from = format_api_date(now - timedelta(days=days))
         
-        # Get data
-        stats = self.ozon_client.get_campaign_stats(campaign_id, date_from, date_to)
-        keyword_stats = self.ozon_client.get_keyword_stats(campaign_id, date_from, date_to)
+        # Get data (both requests concurrently)
+        stats, keyword_stats = asyncio.run(self._fetch_campaign_data(campaign_id, date_from, date_to))
         
         # Analyze
         analysis = self.analyzer.analyze_keywords(keyword_stats)
@@ -91,7 +109,15 @@ class OzonAdsBot:
             'period': f"{date_from} - {date_to}"
         }
     
-    def optimize_campaign(self, campaign_id: str, dry_run: bool = True) -> dict:
+    async def _fetch_campaign_data(self, campaign_id: int, date_from: str, date_to: str):
+        """Fetch campaign and keyword statistics concurrently."""
+        async with self.async_client as client:
+            return await asyncio.gather(
+                client.get_campaign_stats(campaign_id, date_from, date_to),
+                client.get_keyword_stats(campaign_id, date_from, date_to)
+            )
+    
+    def optimize_campaign(self, campaign_id: int, dry_run: bool = True) -> dict:
         """Optimize specific campaign."""
         logger.info(f"Optimizing campaign {campaign_id} (dry_run={dry_run})")
         
@@ -110,7 +136,8 @@ class OzonAdsBot:
         }
         
         # Find keywords to pause
-        pause_keywords = [k['keyword'] for k in analysis if k['action'] == 'pause']
+        pause_keywords = [keyword for keyword, action in map(_get_keyword_action, analysis)
+                          if action == 'pause']
         optimization_results['actions_planned'] += len(pause_keywords)
         
         if pause_keywords:
@@ -130,24 +157,22 @@ class OzonAdsBot:
         
         optimization_results['actions_planned'] += len(high_confidence)
         
-        for adjustment in high_confidence:
+        if high_confidence:
             if not dry_run:
-                success = self.ozon_client.update_keyword_bid(
-                    campaign_id,
-                    adjustment['keyword'],
-                    adjustment['suggested_bid']
-                )
+                success = self.ozon_client.update_keyword_bids(campaign_id, high_confidence)
                 if success:
-                    optimization_results['actions_executed'] += 1
-                    optimization_results['bid_adjustments'].append(adjustment)
+                    optimization_results['actions_executed'] += len(high_confidence)
+                    optimization_results['bid_adjustments'] = high_confidence
                 else:
-                    optimization_results['errors'].append(f"Failed to update bid for {adjustment['keyword']}")
+                    optimization_results['errors'].extend(
+                        f"Failed to update bid for {adjustment['keyword']}" for adjustment in high_confidence
+                    )
             else:
-                optimization_results['bid_adjustments'].append(adjustment)
+                optimization_results['bid_adjustments'] = high_confidence
         
         return optimization_results
     
-    def generate_report(self, campaign_id: str = None, format_type: str = "excel") -> str:
+    def generate_report(self, campaign_id: int = None, format_type: str = "excel") -> str:
         """Generate report for campaign(s)."""
         if campaign_id:
             analysis_result = self.analyze_campaign(campaign_id)
@@ -159,7 +184,7 @@ class OzonAdsBot:
             if not campaigns:
                 raise ValueError("No campaigns found")
             
-            campaign_id = str(campaigns[0].get('id', ''))
+            campaign_id = int(campaigns[0].get('id', 0))
             analysis_result = self.analyze_campaign(campaign_id)
             summary = analysis_result['summary']
             analysis = analysis_result['analysis']
@@ -174,11 +199,33 @@ class OzonAdsBot:
             raise ValueError(f"Unsupported format: {format_type}")
 
 
+@lru_cache(maxsize=1)
+def get_bot() -> OzonAdsBot:
+    """Return the process-wide bot instance, creating it on first use."""
+    return OzonAdsBot()
+
+
+def wait_for_shutdown():
+    """Block until SIGINT/SIGTERM without polling."""
+    stop = threading.Event()
+    
+    def _handle_signal(signum, frame):
+        stop.set()
+    
+    signal.signal(signal.SIGINT, _handle_signal)
+    signal.signal(signal.SIGTERM, _handle_signal)
+    stop.wait()
+
+
 # CLI Interface
 @click.group()
 @click.option('--log-level', default='INFO', help='Log level')
 def cli(log_level):
     """Ozon Ads Bot - автоматизация рекламных кампаний на Ozon."""
+    # Faster event loop for the async API client when uvloop is installed
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    
     logger.remove()
     logger.add(sys.stdout, level=log_level)
     
@@ -196,7 +243,7 @@ def cli(log_level):
 def status():
     """Проверить статус подключения к API."""
     try:
-        bot = OzonAdsBot()
+        bot = get_bot()
         campaigns = bot.ozon_client.get_all_campaigns()
         
         click.echo(f"✅ Подключение к Ozon API: OK")
@@ -216,7 +263,7 @@ def status():
 def test_api():
     """Тестировать API endpoints для поиска работающих."""
     try:
-        bot = OzonAdsBot()
+        bot = get_bot()
         
         click.echo("🧪 Тестирование API endpoints...")
         click.echo("Это может занять некоторое время...")
@@ -247,12 +294,12 @@ def test_api():
 
 
 @cli.command()
-@click.argument('campaign_id')
+@click.argument('campaign_id', type=int)
 @click.option('--days', default=7, help='Период анализа в днях')
 def analyze(campaign_id, days):
     """Анализ эффективности кампании."""
     try:
-        bot = OzonAdsBot()
+        bot = get_bot()
         result = bot.analyze_campaign(campaign_id, days)
         
         summary = result['summary']
@@ -289,7 +336,7 @@ def analyze(campaign_id, days):
 
 
 @cli.command()
-@click.argument('campaign_id')
+@click.argument('campaign_id', type=int)
 @click.option('--dry-run', is_flag=True, help='Показать план без выполнения')
 def optimize(campaign_id, dry_run):
     """Оптимизация кампании."""
@@ -298,7 +345,7 @@ def optimize(campaign_id, dry_run):
         return
     
     try:
-        bot = OzonAdsBot()
+        bot = get_bot()
         result = bot.optimize_campaign(campaign_id, dry_run)
         
         mode = "План оптимизации" if dry_run else "Результат оптимизации"
@@ -329,13 +376,13 @@ def optimize(campaign_id, dry_run):
 
 
 @cli.command()
-@click.option('--campaign-id', help='ID кампании (по умолчанию - первая найденная)')
+@click.option('--campaign-id', type=int, help='ID кампании (по умолчанию - первая найденная)')
 @click.option('--format', 'format_type', default='excel', 
               type=click.Choice(['excel', 'pdf', 'html']), help='Формат отчёта')
 def report(campaign_id, format_type):
     """Генерация отчёта."""
     try:
-        bot = OzonAdsBot()
+        bot = get_bot()
         filepath = bot.generate_report(campaign_id, format_type)
         
         click.echo(f"📊 Отчёт создан: {filepath}")
@@ -352,7 +399,7 @@ def report(campaign_id, format_type):
 def schedule():
     """Запуск планировщика задач."""
     try:
-        bot = OzonAdsBot()
+        bot = get_bot()
         bot.start_scheduler()
         
         click.echo("📅 Планировщик запущен")
@@ -369,14 +416,10 @@ def schedule():
         click.echo("\nПланировщик работает в фоновом режиме")
         click.echo("Для остановки используйте docker-compose down")
         
-        # Keep running
-        try:
-            import time
-            while True:
-                time.sleep(60)  # Check every minute
-        except KeyboardInterrupt:
-            click.echo("\n🛑 Остановка планировщика...")
-            bot.scheduler.stop()
+        # Keep running until stopped
+        wait_for_shutdown()
+        click.echo("\n🛑 Остановка планировщика...")
+        bot.scheduler.stop()
     
     except Exception as e:
         click.echo(f"❌ Ошибка планировщика: {str(e)}")
@@ -386,7 +429,7 @@ def schedule():
 def daemon():
     """Запуск в daemon режиме (планировщик + telegram бот)."""
     try:
-        bot = OzonAdsBot()
+        bot = get_bot()
         
         click.echo("🤖 Запуск Ozon Ads Bot в daemon режиме...")
         
@@ -406,16 +449,12 @@ def daemon():
             click.echo("⚠️ Telegram бот не настроен, работает только планировщик")
             
             # Keep running for scheduler only
-            try:
-                import time
-                click.echo("🔄 Daemon работает в фоновом режиме...")
-                click.echo("Нажмите Ctrl+C для остановки")
-                while True:
-                    time.sleep(60)
-            except KeyboardInterrupt:
-                click.echo("\n🛑 Остановка daemon...")
-                if hasattr(bot.scheduler, 'is_running') and bot.scheduler.is_running:
-                    bot.scheduler.stop()
+            click.echo("🔄 Daemon работает в фоновом режиме...")
+            click.echo("Нажмите Ctrl+C для остановки")
+            wait_for_shutdown()
+            click.echo("\n🛑 Остановка daemon...")
+            if hasattr(bot.scheduler, 'is_running') and bot.scheduler.is_running:
+                bot.scheduler.stop()
     
     except KeyboardInterrupt:
         click.echo("\n🛑 Остановка daemon...")
@@ -433,7 +472,7 @@ def telegram():
         return
     
     try:
-        bot = OzonAdsBot()
+        bot = get_bot()
         
         click.echo("🤖 Запуск Telegram бота...")
         click.echo(f"📱 Bot token: {settings.telegram_bot_token[:20]}...")
@@ -457,7 +496,7 @@ def telegram():
 def interactive():
     """Интерактивный режим."""
     try:
-        bot = OzonAdsBot()
+        bot = get_bot()
         
         click.echo("🚀 Добро пожаловать в Ozon Ads Bot!")
         click.echo("Доступные команды: analyze, optimize, report, schedule, quit")
@@ -478,7 +517,7 @@ def interactive():
                     try:
                         choice = click.prompt("Выберите номер кампании", type=int)
                         if 1 <= choice <= len(campaigns):
-                            campaign_id = str(campaigns[choice-1].get('id'))
+                            campaign_id = int(campaigns[choice-1].get('id'))
                             result = bot.analyze_campaign(campaign_id)
                             
                             # Show summary
@@ -493,6 +532,8 @@ def interactive():
                             click.echo("❌ Неверный номер кампании")
                     except (ValueError, click.Abort):
                         click.echo("❌ Отменено")
+                    except OzonAPIError as e:
+                        click.echo(f"❌ Ошибка API: {str(e)}")
                 else:
                     click.echo("❌ Кампании не найдены")
             
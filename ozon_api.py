@@ -1,104 +1,579 @@
 """Ozon API client for managing advertising campaigns."""
+import asyncio
+import hashlib
 import json
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
-import requests
+from functools import lru_cache
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterator, List, Optional
+import aiohttp
+import httpx
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import ijson
+except ImportError:
+    ijson = None
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 from loguru import logger
 from config import settings
 
 
+# Попробуем несколько вариантов базовых URL
+BASE_URLS = [
+    "https://api-seller.ozon.ru",
+    "https://api.ozon.ru",
+    "https://performance.ozon.ru/api",
+    "https://api-seller.ozon.ru/v1",
+    "https://api-seller.ozon.ru/v2",
+    "https://api-seller.ozon.ru/v3",
+    "https://performance.ozon.ru",
+    "https://ads.ozon.ru/api"
+]
+
+# Варианты API endpoints (включая современные)
+CAMPAIGN_LIST_ENDPOINTS = [
+    "/v3/performance/campaign/list",  # Новейший API
+    "/v2/performance/campaign/list",
+    "/v1/performance/campaign/list", 
+    "/v3/campaign/list",              # Новейший базовый API
+    "/v2/campaign/list",
+    "/v1/campaign/list",
+    "/v1/performance/campaigns",      # Альтернативный endpoint
+    "/v2/performance/campaigns",
+    "/v3/performance/campaigns",
+    "/v1/campaigns",                  # Простой endpoint
+    "/v2/campaigns",
+    "/v3/campaigns"
+]
+
+CAMPAIGN_STATS_ENDPOINTS = [
+    "/v3/performance/campaign/statistics",  # Новейший API
+    "/v2/performance/campaign/statistics",
+    "/v1/performance/campaign/statistics",
+    "/v3/campaign/statistics",              # Новейший базовый API
+    "/v2/campaign/statistics",
+    "/v1/campaign/statistics",
+    "/v1/performance/campaigns/stats",      # Альтернативный endpoint
+    "/v2/performance/campaigns/stats",
+    "/v3/performance/campaigns/stats",
+    "/v1/campaigns/stats",                  # Простой endpoint
+    "/v2/campaigns/stats",
+    "/v3/campaigns/stats"
+]
+
+KEYWORD_LIST_ENDPOINTS = [
+    "/v3/performance/keyword/list",  # Новейший API
+    "/v2/performance/keyword/list",
+    "/v1/performance/keyword/list",
+    "/v3/keyword/list",              # Новейший базовый API
+    "/v2/keyword/list",
+    "/v1/keyword/list",
+    "/v1/performance/keywords",      # Альтернативный endpoint
+    "/v2/performance/keywords",
+    "/v3/performance/keywords",
+    "/v1/keywords",                  # Простой endpoint
+    "/v2/keywords",
+    "/v3/keywords"
+]
+
+# Retry policy for throttling and server errors
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+MAX_RETRIES = 3
+RETRY_BACKOFF_FACTOR = 0.3
+# Upper bound for waits requested by the server via Retry-After (seconds)
+MAX_RETRY_AFTER = 30.0
+
+# Parallel requests when fetching data for several campaigns (below the keep-alive pool size)
+FETCH_WORKERS = 8
+
+# Relative spread applied to cache TTLs so entries (and bot instances) do not refetch in lockstep
+CACHE_TTL_JITTER = 0.1
+
+# Timeout for the one-time reachability probe of base URLs (seconds)
+PROBE_TIMEOUT = 2.0
+
+KEYWORD_STATS_ENDPOINT = "/v1/performance/keyword/statistics"
+KEYWORD_BID_ENDPOINT = "/v1/performance/keyword/bid/set"
+KEYWORD_STATUS_ENDPOINT = "/v1/performance/keyword/status/set"
+
+# Keyword statistics responses from this size on are parsed incrementally with ijson
+STREAM_MIN_BYTES = 1 << 20
+KEYWORD_STATS_ITEMS = "result.campaigns.item.statistics.item"
+
+
+def format_api_date(dt: datetime) -> str:
+    """Format a datetime as the YYYY-MM-DD date the API expects, without strftime."""
+    return dt.date().isoformat()
+
+
+def _stats_request(campaign_ids: List[int], date_from: str, date_to: str, group_by: str) -> Dict:
+    """Build statistics request body for one or more campaigns."""
+    return {
+        "campaigns": [{"id": campaign_id} for campaign_id in campaign_ids],
+        "dateFrom": date_from,
+        "dateTo": date_to,
+        "groupBy": [group_by]
+    }
+
+
+def _retry_delay(retry_after: Optional[str], attempt: int) -> float:
+    """Jittered backoff before the next attempt, honouring a numeric Retry-After header."""
+    delay = RETRY_BACKOFF_FACTOR * 2 ** attempt
+    # Spread retries of concurrent callers so they do not hit the API in lockstep
+    delay += random.uniform(0, delay)
+    if retry_after:
+        try:
+            delay = max(delay, min(float(retry_after), MAX_RETRY_AFTER))
+        except ValueError:
+            pass
+    return delay
+
+
+def _describe_error(error: Exception) -> str:
+    """One-line description of a failed request, with status code and URL for HTTP errors."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return f"HTTP {error.response.status_code} for {error.request.url}"
+    return f"{type(error).__name__}: {error}"
+
+
+def _json_dumps(data: Any) -> bytes:
+    """Serialize request body, using orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+
+def _json_loads(content: bytes) -> Any:
+    """Parse response body, using orjson when available."""
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+# Counter and money fields of a statistics row, in array column order
+STAT_FIELDS = ("impressions", "clicks", "orders", "spend", "revenue")
+
+
+_get_stat_fields = itemgetter(*STAT_FIELDS)
+
+
+def _stat_values(row: Dict) -> tuple:
+    """STAT_FIELDS values of a statistics row, 0 for missing fields."""
+    try:
+        return _get_stat_fields(row)
+    except KeyError:
+        return tuple(row.get(field, 0) for field in STAT_FIELDS)
+
+
+def _stats_array(rows: List[Dict]):
+    """Stack statistics rows into an (n, 5) float array of STAT_FIELDS."""
+    import numpy as np
+    
+    # NumPy converts numeric strings (money fields) to float itself
+    values = [_stat_values(row) for row in rows]
+    return np.array(values, dtype=np.float64).reshape(-1, len(STAT_FIELDS))
+
+
+def _ratio(numerator, denominator, scale: float = 100.0):
+    """Element-wise numerator / denominator * scale with 0 where denominator is 0."""
+    import numpy as np
+    
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    out = np.zeros(np.broadcast(numerator, denominator).shape)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out * scale
+
+
+def _aggregate_campaign_stats(campaign_id: int, stats: Dict) -> Dict:
+    """Sum per-date campaign statistics and calculate metrics."""
+    rows = [stat for item in stats.get("campaigns", []) for stat in item.get("statistics", [])]
+    arr = _stats_array(rows)
+    impressions, clicks, orders = arr[:, :3].sum(axis=0).tolist()
+    # Exactly rounded money sums for long periods
+    spend = math.fsum(arr[:, 3].tolist())
+    revenue = math.fsum(arr[:, 4].tolist())
+    
+    totals = {
+        "campaign_id": campaign_id,
+        "impressions": int(impressions),
+        "clicks": int(clicks),
+        "orders": int(orders),
+        "spend": spend,
+        "revenue": revenue
+    }
+    
+    # Calculate metrics
+    totals["ctr"] = float(_ratio(clicks, impressions))
+    totals["cr"] = float(_ratio(orders, clicks))
+    totals["drr"] = float(_ratio(spend, revenue))
+    totals["roi"] = float(_ratio(revenue, spend, scale=1.0))
+    
+    return totals
+
+
+def _split_campaign_stats(campaign_ids: List[int], stats: Dict) -> Dict[int, Dict]:
+    """Aggregate a statistics response separately for every requested campaign."""
+    if len(campaign_ids) == 1:
+        return {campaign_ids[0]: _aggregate_campaign_stats(campaign_ids[0], stats)}
+    
+    items = stats.get("campaigns", [])
+    buckets = {campaign_id: [] for campaign_id in campaign_ids}
+    for item in items:
+        try:
+            bucket = buckets.get(int(item.get("id")))
+        except (TypeError, ValueError):
+            bucket = None
+        if bucket is not None:
+            bucket.append(item)
+    
+    if items and not any(buckets.values()):
+        raise OzonAPIError(f"Statistics response has no rows attributable to campaigns {campaign_ids}")
+    
+    # Campaigns absent from the response get {} rather than zero totals
+    return {
+        campaign_id: _aggregate_campaign_stats(campaign_id, {"campaigns": items}) if items else {}
+        for campaign_id, items in buckets.items()
+    }
+
+
+@lru_cache(maxsize=None)
+def _numba_keyword_metrics():
+    """Compile the fused CTR/CR/DRR kernel, or return None without Numba."""
+    try:
+        import numpy as np
+        from numba import njit
+    except ImportError:
+        return None
+    
+    @njit(cache=True)
+    def keyword_metrics(stats):
+        n = stats.shape[0]
+        metrics = np.zeros((n, 3))
+        for i in range(n):
+            impressions, clicks, orders, spend, revenue = stats[i, 0], stats[i, 1], stats[i, 2], stats[i, 3], stats[i, 4]
+            if impressions > 0:
+                metrics[i, 0] = clicks / impressions * 100
+            if clicks > 0:
+                metrics[i, 1] = orders / clicks * 100
+            if revenue > 0:
+                metrics[i, 2] = spend / revenue * 100
+        return metrics
+    
+    return keyword_metrics
+
+
+def _keyword_metrics(arr):
+    """Return (n, 3) array of CTR, CR and DRR for a STAT_FIELDS array."""
+    kernel = _numba_keyword_metrics()
+    if kernel is not None:
+        return kernel(arr)
+    
+    import numpy as np
+    
+    impressions, clicks, orders, spend, revenue = arr.T
+    return np.column_stack((
+        _ratio(clicks, impressions),
+        _ratio(orders, clicks),
+        _ratio(spend, revenue)
+    ))
+
+
+def _keyword_stat_rows(response: Dict) -> List[Dict]:
+    """Flatten per-campaign keyword statistics rows of a response."""
+    stats = response.get("result", {}).get("campaigns", [])
+    return [stat for campaign in stats for stat in campaign.get("statistics", [])]
+
+
+def _parse_keyword_stats(response: Dict) -> List[Dict]:
+    """Convert keyword statistics response into keyword metric dicts."""
+    return _keyword_stats_from_rows(_keyword_stat_rows(response))
+
+
+def _keyword_stats_from_rows(rows: List[Dict]) -> List[Dict]:
+    """Convert keyword statistics rows into keyword metric dicts."""
+    if not rows:
+        return []
+    
+    arr = _stats_array(rows)
+    counts = arr[:, :3].astype(int).tolist()
+    money = arr[:, 3:].tolist()
+    
+    # Calculate metrics for all keywords at once
+    metrics = _keyword_metrics(arr).tolist()
+    columns = (
+        (*count_row, *money_row, *metric_row)
+        for count_row, money_row, metric_row in zip(counts, money, metrics)
+    )
+    
+    return [
+        {
+            "keyword": stat.get("keyword", ""),
+            "impressions": imp,
+            "clicks": clk,
+            "orders": ords,
+            "spend": spd,
+            "revenue": rev,
+            "ctr": ctr,
+            "cr": cr,
+            "drr": drr
+        }
+        for stat, (imp, clk, ords, spd, rev, ctr, cr, drr) in zip(rows, columns)
+    ]
+
+
+class TTLCache:
+    """Thread-safe bounded in-memory cache with per-entry expiry."""
+    
+    __slots__ = ("maxsize", "_data", "_lock")
+    
+    def __init__(self, maxsize: int = 512):
+        """Initialize cache."""
+        self.maxsize = maxsize
+        self._data: Dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, key: tuple, allow_stale: bool = False) -> Any:
+        """Return cached value or None if missing or expired, expired values only with allow_stale."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            # Expired entries are kept as a fallback until evicted or overwritten
+            if expires_at < time.monotonic() and not allow_stale:
+                return None
+            return value
+    
+    def set(self, key: tuple, value: Any, ttl: float):
+        """Store value for about ttl seconds (smudged by CACHE_TTL_JITTER)."""
+        ttl *= random.uniform(1 - CACHE_TTL_JITTER, 1 + CACHE_TTL_JITTER)
+        with self._lock:
+            if key not in self._data and len(self._data) >= self.maxsize:
+                # Drop the oldest inserted entry
+                self._data.pop(next(iter(self._data)))
+            self._data[key] = (time.monotonic() + ttl, value)
+    
+    def invalidate(self, campaign_id: int = None):
+        """Drop entries for a campaign, or everything if no campaign given."""
+        with self._lock:
+            if campaign_id is None:
+                self._data.clear()
+                return
+            for key in [k for k in self._data if len(k) > 1 and k[1] == campaign_id]:
+                del self._data[key]
+
+
 class OzonAPIError(Exception):
     """Custom exception for Ozon API errors."""
-    pass
+    __slots__ = ()
 
 
 class OzonAPIClient:
     """Client for interacting with Ozon Ads API."""
     
+    __slots__ = ("client_id", "api_key", "base_urls", "base_url", "session", "cache", "_endpoint_cache",
+                 "_base_urls_probed", "_validators", "_url_lock")
+    
     def __init__(self, client_id: str = None, api_key: str = None):
         """Initialize Ozon API client."""
         self.client_id = client_id or settings.ozon_client_id
         self.api_key = api_key or settings.ozon_api_key
-        # Попробуем несколько вариантов базовых URL
-        self.base_urls = [
-            "https://api-seller.ozon.ru",
-            "https://api.ozon.ru",
-            "https://performance.ozon.ru/api",
-            "https://api-seller.ozon.ru/v1",
-            "https://api-seller.ozon.ru/v2",
-            "https://api-seller.ozon.ru/v3",
-            "https://performance.ozon.ru",
-            "https://ads.ozon.ru/api"
-        ]
+        self.base_urls = list(BASE_URLS)
         self.base_url = self.base_urls[0]  # По умолчанию
-        self.session = requests.Session()
-        self.session.headers.update({
-            "Client-Id": self.client_id,
-            "Api-Key": self.api_key,
-            "Content-Type": "application/json"
-        })
+        # Keep-alive pool (HTTP/2 multiplexing when h2 is installed), connect retries;
+        # every pooled connection stays alive so worker bursts do not reconnect
+        limits = httpx.Limits(max_connections=32, max_keepalive_connections=32)
+        self.session = httpx.Client(
+            headers={
+                "Client-Id": self.client_id,
+                "Api-Key": self.api_key,
+                "Content-Type": "application/json"
+            },
+            timeout=30.0,
+            transport=httpx.HTTPTransport(http2=HTTP2_AVAILABLE, limits=limits, retries=MAX_RETRIES)
+        )
+        self.cache = TTLCache()
+        self._endpoint_cache: Dict[str, str] = {}
+        self._base_urls_probed = False
+        # Guards base URL reordering, which happens from thread pool workers
+        self._url_lock = threading.Lock()
+        # (url, body) -> (ETag, body digest, parsed response) for conditional requests
+        self._validators: Dict[tuple, tuple] = {}
+    
+    def invalidate(self, campaign_id: int = None):
+        """Drop cached responses after campaign changes."""
+        self.cache.invalidate(campaign_id)
+    
+    def _promote_base_url(self, base_url: str):
+        """Remember working base URL and try it first next time."""
+        with self._url_lock:
+            if self.base_url != base_url:
+                logger.info(f"Successfully using base URL: {base_url}")
+            self.base_url = base_url
+            if self.base_urls[0] != base_url:
+                self.base_urls = [base_url] + [u for u in self.base_urls if u != base_url]
+    
+    def _probe_endpoints(self, call_type: str, endpoints: List[str], data: Dict,
+                         accept: Callable[[Dict], bool] = None, conditional: bool = False) -> Optional[Dict]:
+        """Request the first working endpoint, starting from the one that worked last time."""
+        cached = self._endpoint_cache.get(call_type)
+        if cached:
+            endpoints = [cached] + [e for e in endpoints if e != cached]
+        
+        for endpoint in endpoints:
+            try:
+                logger.debug("Trying {} endpoint: {}", call_type, endpoint)
+                response = self._make_request("POST", endpoint, data, conditional=conditional)
+            except Exception as e:
+                logger.debug("{} endpoint {} failed: {}", call_type, endpoint, e)
+                continue
+            
+            if accept is None or accept(response):
+                self._endpoint_cache[call_type] = endpoint
+                return response
+        
+        return None
+    
+    @contextmanager
+    def _open(self, method: str, url: str, data: Dict = None,
+              headers: Dict = None) -> Iterator[httpx.Response]:
+        """Open a streamed response, retrying with backoff on throttling and server errors."""
+        is_get = method.upper() == "GET"
+        body = _json_dumps(data) if data is not None and not is_get else None
+        
+        # Only GET and POST are used by the Ozon API
+        for attempt in range(MAX_RETRIES + 1):
+            if is_get:
+                request = self.session.stream("GET", url, params=data, headers=headers)
+            else:
+                request = self.session.stream("POST", url, content=body, headers=headers)
+            
+            with request as response:
+                if response.status_code not in RETRY_STATUS_CODES or attempt == MAX_RETRIES:
+                    yield response
+                    return
+                delay = _retry_delay(response.headers.get("Retry-After"), attempt)
+            time.sleep(delay)
     
-    def _make_request(self, method: str, endpoint: str, data: Dict = None) -> Dict:
+    def _send(self, method: str, url: str, data: Dict = None, headers: Dict = None) -> httpx.Response:
+        """Send request and read the body, retrying with backoff on throttling and server errors."""
+        with self._open(method, url, data, headers) as response:
+            response.read()
+        return response
+    
+    def _probe_base_urls(self):
+        """Probe all base URLs in parallel once and try reachable hosts first."""
+        # Concurrent callers wait here until the first probe has reordered the URLs
+        with self._url_lock:
+            if not self._base_urls_probed:
+                self._reorder_base_urls()
+                self._base_urls_probed = True
+    
+    def _reorder_base_urls(self):
+        """Move base URLs that answer a HEAD request to the front."""
+        def reachable(base_url: str) -> bool:
+            try:
+                self.session.head(base_url, timeout=PROBE_TIMEOUT)
+                return True
+            except httpx.HTTPError:
+                return False
+        
+        urls = list(self.base_urls)
+        with ThreadPoolExecutor(max_workers=len(urls)) as executor:
+            results = list(executor.map(reachable, urls))
+        
+        self.base_urls = [u for u, ok in zip(urls, results) if ok] + [u for u, ok in zip(urls, results) if not ok]
+        self.base_url = self.base_urls[0]
+        logger.debug("Base URL order after probe: {}", self.base_urls)
+    
+    def _make_request(self, method: str, endpoint: str, data: Dict = None, conditional: bool = False) -> Dict:
         """Make HTTP request to Ozon API with automatic fallback to alternative URLs."""
-        for base_url in self.base_urls:
+        if not self._base_urls_probed:
+            self._probe_base_urls()
+        
+        last_error = None
+        for base_url in list(self.base_urls):
             url = f"{base_url}{endpoint}"
             try:
-                logger.info(f"Trying API request to: {url}")
-                if method.upper() == "GET":
-                    response = self.session.get(url, params=data)
-                else:
-                    response = self.session.request(method, url, json=data)
+                logger.debug("Trying API request to: {}", url)
+                # Conditional requests revalidate the previous response via ETag
+                validator_key = (url, _json_dumps(data)) if conditional else None
+                previous = self._validators.get(validator_key) if conditional else None
+                headers = {"If-None-Match": previous[0]} if previous and previous[0] else None
+                
+                response = self._send(method, url, data, headers)
+                if previous is not None and response.status_code == 304:
+                    self._promote_base_url(base_url)
+                    return previous[2]
                 
                 response.raise_for_status()
                 # Если успешно, обновляем текущий базовый URL
-                self.base_url = base_url
-                logger.info(f"Successfully using base URL: {base_url}")
-                return response.json()
+                self._promote_base_url(base_url)
+                if not conditional:
+                    return _json_loads(response.content)
                 
-            except requests.exceptions.RequestException as e:
-                logger.warning(f"API request failed for {base_url}: {e}")
-                continue
+                # Skip parsing when the body did not change
+                digest = hashlib.blake2b(response.content, digest_size=16).digest()
+                if previous is not None and previous[1] == digest:
+                    return previous[2]
+                result = _json_loads(response.content)
+                self._validators[validator_key] = (response.headers.get("ETag"), digest, result)
+                return result
+                
+            except (httpx.HTTPError, ValueError) as e:
+                # Keep only the description; the exception and its frames are released here
+                last_error = _describe_error(e)
+                logger.debug("API request failed for {}: {}", base_url, e)
         
         # Если все URL не работают
-        raise OzonAPIError(f"All API endpoints failed for endpoint: {endpoint}")
+        raise OzonAPIError(f"All API endpoints failed for endpoint: {endpoint} (last error: {last_error})")
     
     def get_all_campaigns(self) -> List[Dict]:
         """Get all advertising campaigns."""
+        cached = self.cache.get(("campaigns",))
+        if cached is not None:
+            return cached
+        
+        campaigns = self._fetch_all_campaigns()
+        if campaigns is None:
+            # API unavailable, fall back to the last known campaign list
+            return self.cache.get(("campaigns",), allow_stale=True) or []
+        if campaigns:
+            self.cache.set(("campaigns",), campaigns, settings.campaigns_cache_ttl)
+        return campaigns
+    
+    def _fetch_all_campaigns(self) -> Optional[List[Dict]]:
+        """Fetch all advertising campaigns from the API, None on failure."""
         logger.info("Fetching all campaigns")
         
         try:
-            # Попробуем несколько вариантов API endpoints (включая современные)
-            endpoints = [
-                "/v3/performance/campaign/list",  # Новейший API
-                "/v2/performance/campaign/list",
-                "/v1/performance/campaign/list", 
-                "/v3/campaign/list",              # Новейший базовый API
-                "/v2/campaign/list",
-                "/v1/campaign/list",
-                "/v1/performance/campaigns",      # Альтернативный endpoint
-                "/v2/performance/campaigns",
-                "/v3/performance/campaigns",
-                "/v1/campaigns",                  # Простой endpoint
-                "/v2/campaigns",
-                "/v3/campaigns"
-            ]
-            
-            for endpoint in endpoints:
-                try:
-                    logger.info(f"Trying endpoint: {endpoint}")
-                    response = self._make_request("POST", endpoint, {})
-                    campaigns = response.get("result", {}).get("campaigns", [])
-                    
-                    if campaigns:
-                        logger.info(f"Found {len(campaigns)} campaigns using {endpoint}")
-                        return campaigns
-                except Exception as e:
-                    logger.warning(f"Endpoint {endpoint} failed: {e}")
-                    continue
+            response = self._probe_endpoints(
+                "campaigns_list", CAMPAIGN_LIST_ENDPOINTS, {},
+                accept=lambda r: bool(r.get("result", {}).get("campaigns")),
+                conditional=True
+            )
+            if response:
+                campaigns = response["result"]["campaigns"]
+                logger.info(f"Found {len(campaigns)} campaigns using {self._endpoint_cache['campaigns_list']}")
+                return campaigns
             
             # Если все endpoints не работают, попробуем базовый endpoint
             logger.info("Trying base campaign endpoint")
-            response = self._make_request("POST", "/v1/campaign/list", {})
+            response = self._make_request("POST", "/v1/campaign/list", {}, conditional=True)
             campaigns = response.get("result", {}).get("campaigns", [])
             
             logger.info(f"Found {len(campaigns)} campaigns")
@@ -106,117 +581,72 @@ class OzonAPIClient:
         
         except Exception as e:
             logger.error(f"Failed to fetch campaigns: {e}")
-            return []
+            return None
     
-    def get_campaign_stats(self, campaign_id: str, date_from: str, date_to: str) -> Dict:
+    def get_campaign_stats(self, campaign_id: int, date_from: str, date_to: str) -> Dict:
         """Get campaign statistics for specified period."""
-        logger.info(f"Fetching stats for campaign {campaign_id} from {date_from} to {date_to}")
+        return self.get_campaign_stats_batch([campaign_id], date_from, date_to).get(campaign_id, {})
+    
+    def get_campaign_stats_batch(self, campaign_ids: List[int], date_from: str, date_to: str) -> Dict[int, Dict]:
+        """Get statistics for several campaigns with a single request."""
+        results = {}
+        missing = []
+        for campaign_id in campaign_ids:
+            cached = self.cache.get(("stats", campaign_id, date_from, date_to))
+            if cached is not None:
+                results[campaign_id] = cached
+            else:
+                missing.append(campaign_id)
         
-        data = {
-            "campaigns": [{"id": int(campaign_id)}],
-            "dateFrom": date_from,
-            "dateTo": date_to,
-            "groupBy": ["DATE"]
-        }
+        if missing:
+            for campaign_id, stats in self._fetch_campaign_stats(missing, date_from, date_to).items():
+                if stats:
+                    self.cache.set(("stats", campaign_id, date_from, date_to), stats, settings.stats_cache_ttl)
+                results[campaign_id] = stats
         
-        try:
-            # Попробуем несколько вариантов API endpoints для статистики (включая современные)
-            endpoints = [
-                "/v3/performance/campaign/statistics",  # Новейший API
-                "/v2/performance/campaign/statistics",
-                "/v1/performance/campaign/statistics",
-                "/v3/campaign/statistics",              # Новейший базовый API
-                "/v2/campaign/statistics",
-                "/v1/campaign/statistics",
-                "/v1/performance/campaigns/stats",      # Альтернативный endpoint
-                "/v2/performance/campaigns/stats",
-                "/v3/performance/campaigns/stats",
-                "/v1/campaigns/stats",                  # Простой endpoint
-                "/v2/campaigns/stats",
-                "/v3/campaigns/stats"
-            ]
-            
-            response = None
-            for endpoint in endpoints:
-                try:
-                    logger.info(f"Trying statistics endpoint: {endpoint}")
-                    response = self._make_request("POST", endpoint, data)
-                    break
-                except Exception as e:
-                    logger.warning(f"Statistics endpoint {endpoint} failed: {e}")
-                    continue
-            
-            if not response:
-                raise Exception("All statistics endpoints failed")
-            stats = response.get("result", {})
-            
-            if not stats:
-                logger.warning(f"No stats found for campaign {campaign_id}")
-                return {}
-            
-            # Aggregate stats
-            totals = {
-                "campaign_id": campaign_id,
-                "impressions": 0,
-                "clicks": 0,
-                "orders": 0,
-                "spend": 0.0,
-                "revenue": 0.0
-            }
-            
-            for item in stats.get("campaigns", []):
-                for stat in item.get("statistics", []):
-                    totals["impressions"] += stat.get("impressions", 0)
-                    totals["clicks"] += stat.get("clicks", 0)
-                    totals["orders"] += stat.get("orders", 0)
-                    totals["spend"] += float(stat.get("spend", 0))
-                    totals["revenue"] += float(stat.get("revenue", 0))
-            
-            # Calculate metrics
-            totals["ctr"] = (totals["clicks"] / totals["impressions"] * 100) if totals["impressions"] > 0 else 0
-            totals["cr"] = (totals["orders"] / totals["clicks"] * 100) if totals["clicks"] > 0 else 0
-            totals["drr"] = (totals["spend"] / totals["revenue"] * 100) if totals["revenue"] > 0 else 0
-            totals["roi"] = (totals["revenue"] / totals["spend"]) if totals["spend"] > 0 else 0
-            
-            return totals
+        return results
+    
+    def _fetch_campaign_stats(self, campaign_ids: List[int], date_from: str, date_to: str) -> Dict[int, Dict]:
+        """Fetch statistics for campaigns from the API, raising OzonAPIError if it is unavailable."""
+        logger.debug("Fetching stats for campaigns {} from {} to {}", campaign_ids, date_from, date_to)
         
-        except Exception as e:
-            logger.error(f"Failed to fetch campaign stats: {e}")
-            return {}
+        data = _stats_request(campaign_ids, date_from, date_to, "DATE")
+        
+        response = self._probe_endpoints("statistics", CAMPAIGN_STATS_ENDPOINTS, data)
+        if not response:
+            raise OzonAPIError(f"All statistics endpoints failed for campaigns {campaign_ids}")
+        stats = response.get("result", {})
+        
+        if not stats:
+            logger.warning(f"No stats found for campaigns {campaign_ids}")
+            return {campaign_id: {} for campaign_id in campaign_ids}
+        
+        return _split_campaign_stats(campaign_ids, stats)
     
-    def get_campaign_keywords(self, campaign_id: str) -> List[Dict]:
+    def get_campaign_keywords(self, campaign_id: int) -> List[Dict]:
         """Get keywords for specific campaign."""
+        key = ("keywords", campaign_id)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        
+        keywords = self._fetch_campaign_keywords(campaign_id)
+        if keywords is None:
+            # API unavailable, fall back to the last known keywords
+            return self.cache.get(key, allow_stale=True) or []
+        if keywords:
+            self.cache.set(key, keywords, settings.keywords_cache_ttl)
+        return keywords
+    
+    def _fetch_campaign_keywords(self, campaign_id: int) -> Optional[List[Dict]]:
+        """Fetch keywords for specific campaign from the API, None on failure."""
         logger.info(f"Fetching keywords for campaign {campaign_id}")
         
         try:
             # Get keywords list
-            data = {"campaignId": int(campaign_id)}
-            
-            # Попробуем несколько вариантов API endpoints для ключевых слов (включая современные)
-            endpoints = [
-                "/v3/performance/keyword/list",  # Новейший API
-                "/v2/performance/keyword/list",
-                "/v1/performance/keyword/list",
-                "/v3/keyword/list",              # Новейший базовый API
-                "/v2/keyword/list",
-                "/v1/keyword/list",
-                "/v1/performance/keywords",      # Альтернативный endpoint
-                "/v2/performance/keywords",
-                "/v3/performance/keywords",
-                "/v1/keywords",                  # Простой endpoint
-                "/v2/keywords",
-                "/v3/keywords"
-            ]
+            data = {"campaignId": campaign_id}
             
-            response = None
-            for endpoint in endpoints:
-                try:
-                    logger.info(f"Trying keyword endpoint: {endpoint}")
-                    response = self._make_request("POST", endpoint, data)
-                    break
-                except Exception as e:
-                    logger.warning(f"Keyword endpoint {endpoint} failed: {e}")
-                    continue
+            response = self._probe_endpoints("keyword_list", KEYWORD_LIST_ENDPOINTS, data, conditional=True)
             
             if not response:
                 raise Exception("All keyword endpoints failed")
@@ -227,83 +657,135 @@ class OzonAPIClient:
         
         except Exception as e:
             logger.error(f"Failed to fetch keywords: {e}")
-            return []
+            return None
     
-    def get_keyword_stats(self, campaign_id: str, date_from: str, date_to: str) -> List[Dict]:
-        """Get keyword statistics."""
-        logger.info(f"Fetching keyword stats for campaign {campaign_id}")
+    def get_keyword_stats(self, campaign_id: int, date_from: str, date_to: str) -> List[Dict]:
+        """Get keyword statistics, raising OzonAPIError if the API is unavailable."""
+        key = ("keyword_stats", campaign_id, date_from, date_to)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
         
-        data = {
-            "campaigns": [{"id": int(campaign_id)}],
-            "dateFrom": date_from,
-            "dateTo": date_to,
-            "groupBy": ["KEYWORD"]
-        }
+        keyword_stats = self._fetch_keyword_stats(campaign_id, date_from, date_to)
+        if keyword_stats:
+            self.cache.set(key, keyword_stats, settings.stats_cache_ttl)
+        return keyword_stats
+    
+    def _fetch_keyword_stats(self, campaign_id: int, date_from: str, date_to: str) -> List[Dict]:
+        """Fetch keyword statistics from the API."""
+        logger.debug("Fetching keyword stats for campaign {}", campaign_id)
         
-        try:
-            response = self._make_request("POST", "/v1/performance/keyword/statistics", data)
-            stats = response.get("result", {}).get("campaigns", [])
-            
-            keyword_stats = []
-            for campaign in stats:
-                for stat in campaign.get("statistics", []):
-                    keyword_data = {
-                        "keyword": stat.get("keyword", ""),
-                        "impressions": stat.get("impressions", 0),
-                        "clicks": stat.get("clicks", 0),
-                        "orders": stat.get("orders", 0),
-                        "spend": float(stat.get("spend", 0)),
-                        "revenue": float(stat.get("revenue", 0))
-                    }
-                    
-                    # Calculate metrics
-                    keyword_data["ctr"] = (keyword_data["clicks"] / keyword_data["impressions"] * 100) if keyword_data["impressions"] > 0 else 0
-                    keyword_data["cr"] = (keyword_data["orders"] / keyword_data["clicks"] * 100) if keyword_data["clicks"] > 0 else 0
-                    keyword_data["drr"] = (keyword_data["spend"] / keyword_data["revenue"] * 100) if keyword_data["revenue"] > 0 else 0
+        data = _stats_request([campaign_id], date_from, date_to, "KEYWORD")
+        
+        if ijson is not None:
+            return _keyword_stats_from_rows(self._stream_keyword_stat_rows(data))
+        response = self._make_request("POST", KEYWORD_STATS_ENDPOINT, data)
+        return _parse_keyword_stats(response)
+    
+    def _stream_keyword_stat_rows(self, data: Dict) -> List[Dict]:
+        """Fetch keyword statistics rows, parsing large responses incrementally."""
+        if not self._base_urls_probed:
+            self._probe_base_urls()
+        
+        last_error = None
+        for base_url in list(self.base_urls):
+            url = f"{base_url}{KEYWORD_STATS_ENDPOINT}"
+            try:
+                logger.debug("Streaming API request to: {}", url)
+                with self._open("POST", url, data) as response:
+                    response.raise_for_status()
                     
-                    keyword_stats.append(keyword_data)
+                    # Small responses are cheaper to parse in one go
+                    length = response.headers.get("Content-Length")
+                    if length is not None and int(length) < STREAM_MIN_BYTES:
+                        rows = _keyword_stat_rows(_json_loads(response.read()))
+                    else:
+                        rows = ijson.sendable_list()
+                        parser = ijson.items_coro(rows, KEYWORD_STATS_ITEMS, use_float=True)
+                        for chunk in response.iter_bytes():
+                            parser.send(chunk)
+                        parser.close()
+                
+                self._promote_base_url(base_url)
+                return rows
             
-            return keyword_stats
+            except (httpx.HTTPError, ValueError, ijson.JSONError) as e:
+                # Keep only the description; the exception and its frames are released here
+                last_error = _describe_error(e)
+                logger.debug("API request failed for {}: {}", base_url, e)
         
-        except Exception as e:
-            logger.error(f"Failed to fetch keyword stats: {e}")
-            return []
+        raise OzonAPIError(f"All API endpoints failed for endpoint: {KEYWORD_STATS_ENDPOINT} (last error: {last_error})")
+    
+    def _map_campaigns(self, fetch: Callable[[int], Any], campaign_ids: List[int],
+                       default: Callable[[], Any], max_workers: int) -> List:
+        """Run fetch for every campaign in a thread pool, preserving order."""
+        def safe_fetch(campaign_id: int):
+            try:
+                return fetch(campaign_id)
+            except Exception as e:
+                logger.error(f"Failed to fetch data for campaign {campaign_id}: {e}")
+                return default()
+        
+        if len(campaign_ids) <= 1:
+            return [safe_fetch(campaign_id) for campaign_id in campaign_ids]
+        
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(campaign_ids))) as executor:
+            return list(executor.map(safe_fetch, campaign_ids))
+    
+    def get_stats_for_campaigns(self, campaign_ids: List[int], date_from: str, date_to: str) -> List[Dict]:
+        """Get statistics for several campaigns in one request, in input order."""
+        stats = self.get_campaign_stats_batch(campaign_ids, date_from, date_to)
+        return [stats.get(campaign_id, {}) for campaign_id in campaign_ids]
     
-    def update_keyword_bid(self, campaign_id: str, keyword: str, new_bid: float) -> bool:
+    def get_keyword_stats_batch(self, campaign_ids: List[int], date_from: str, date_to: str,
+                                max_workers: int = FETCH_WORKERS) -> List[List[Dict]]:
+        """Get keyword statistics for several campaigns concurrently."""
+        return self._map_campaigns(
+            lambda campaign_id: self.get_keyword_stats(campaign_id, date_from, date_to),
+            campaign_ids, list, max_workers
+        )
+    
+    def update_keyword_bid(self, campaign_id: int, keyword: str, new_bid: float) -> bool:
         """Update keyword bid."""
-        logger.info(f"Updating bid for keyword '{keyword}' to {new_bid}")
+        return self.update_keyword_bids(campaign_id, [{"keyword": keyword, "suggested_bid": new_bid}])
+    
+    def update_keyword_bids(self, campaign_id: int, adjustments: List[Dict]) -> bool:
+        """Update bids for several keywords in a single request."""
+        if not adjustments:
+            return True
+        
+        logger.info(f"Updating bids for {len(adjustments)} keywords in campaign {campaign_id}")
         
         try:
             data = {
-                "campaignId": int(campaign_id),
+                "campaignId": campaign_id,
                 "keywords": [
-                    {
-                        "keyword": keyword,
-                        "bid": new_bid
-                    }
+                    {"keyword": a["keyword"], "bid": a["suggested_bid"]}
+                    for a in adjustments
                 ]
             }
             
-            response = self._make_request("POST", "/v1/performance/keyword/bid/set", data)
+            response = self._make_request("POST", KEYWORD_BID_ENDPOINT, data)
             
             if response.get("result"):
-                logger.info(f"Successfully updated bid for '{keyword}'")
+                logger.info(f"Successfully updated bids for {len(adjustments)} keywords")
+                self.invalidate(campaign_id)
                 return True
             else:
-                logger.error(f"Failed to update bid for '{keyword}': {response}")
+                logger.error(f"Failed to update bids: {response}")
                 return False
         
         except Exception as e:
-            logger.error(f"Error updating bid for '{keyword}': {e}")
+            logger.error(f"Error updating bids: {e}")
             return False
     
-    def add_negative_keywords(self, campaign_id: str, negative_keywords: List[str]) -> bool:
+    def add_negative_keywords(self, campaign_id: int, negative_keywords: List[str]) -> bool:
         """Add negative keywords to campaign."""
         logger.info(f"Adding {len(negative_keywords)} negative keywords to campaign {campaign_id}")
         
         try:
             data = {
-                "campaignId": int(campaign_id),
+                "campaignId": campaign_id,
                 "negativeKeywords": negative_keywords
             }
             
@@ -311,6 +793,7 @@ class OzonAPIClient:
             
             if response.get("result"):
                 logger.info("Successfully added negative keywords")
+                self.invalidate(campaign_id)
                 return True
             else:
                 logger.error(f"Failed to add negative keywords: {response}")
@@ -320,20 +803,21 @@ class OzonAPIClient:
             logger.error(f"Error adding negative keywords: {e}")
             return False
     
-    def pause_keywords(self, campaign_id: str, keywords: List[str]) -> bool:
+    def pause_keywords(self, campaign_id: int, keywords: List[str]) -> bool:
         """Pause keywords in campaign."""
         logger.info(f"Pausing {len(keywords)} keywords in campaign {campaign_id}")
         
         try:
             data = {
-                "campaignId": int(campaign_id),
+                "campaignId": campaign_id,
                 "keywords": [{"keyword": kw, "status": "PAUSED"} for kw in keywords]
             }
             
-            response = self._make_request("POST", "/v1/performance/keyword/status/set", data)
+            response = self._make_request("POST", KEYWORD_STATUS_ENDPOINT, data)
             
             if response.get("result"):
                 logger.info("Successfully paused keywords")
+                self.invalidate(campaign_id)
                 return True
             else:
                 logger.error(f"Failed to pause keywords: {response}")
@@ -376,7 +860,7 @@ class OzonAPIClient:
                 url = f"{base_url}{endpoint}"
                 try:
                     logger.info(f"Testing: {url}")
-                    response = self.session.post(url, json={}, headers=self.session.headers)
+                    response = self.session.post(url, content=_json_dumps({}))
                     if response.status_code == 200:
                         results[endpoint] = True
                         logger.info(f"✅ Working endpoint: {endpoint} with {base_url}")
@@ -390,4 +874,293 @@ class OzonAPIClient:
         working_endpoints = [ep for ep, works in results.items() if works]
         logger.info(f"Working endpoints found: {working_endpoints}")
         
-        return results
\ No newline at end of file
+        return results
+
+
+class AsyncOzonAPIClient:
+    """Asynchronous client for Ozon Ads API on a shared aiohttp session."""
+    
+    __slots__ = ("client_id", "api_key", "base_urls", "base_url", "headers", "_session", "cache", "_endpoint_cache",
+                 "_base_urls_probed")
+    
+    def __init__(self, client_id: str = None, api_key: str = None, cache: TTLCache = None):
+        """Initialize async Ozon API client, optionally sharing a response cache."""
+        self.client_id = client_id or settings.ozon_client_id
+        self.api_key = api_key or settings.ozon_api_key
+        self.base_urls = list(BASE_URLS)
+        self.base_url = self.base_urls[0]  # По умолчанию
+        self.headers = {
+            "Client-Id": self.client_id,
+            "Api-Key": self.api_key,
+            "Content-Type": "application/json"
+        }
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.cache = cache or TTLCache()
+        self._endpoint_cache: Dict[str, str] = {}
+        self._base_urls_probed = False
+    
+    def invalidate(self, campaign_id: int = None):
+        """Drop cached responses after campaign changes."""
+        self.cache.invalidate(campaign_id)
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Create the pooled keep-alive session on first use."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=100, limit_per_host=32, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(headers=self.headers, connector=connector)
+        return self._session
+    
+    async def close(self):
+        """Close the underlying HTTP session."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    async def __aenter__(self) -> "AsyncOzonAPIClient":
+        await self._get_session()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
+    def _promote_base_url(self, base_url: str):
+        """Remember working base URL and try it first next time."""
+        if self.base_url != base_url:
+            logger.info(f"Successfully using base URL: {base_url}")
+        self.base_url = base_url
+        if self.base_urls[0] != base_url:
+            self.base_urls.remove(base_url)
+            self.base_urls.insert(0, base_url)
+    
+    async def _probe_endpoints(self, call_type: str, endpoints: List[str], data: Dict,
+                               accept: Callable[[Dict], bool] = None) -> Optional[Dict]:
+        """Request the first working endpoint, starting from the one that worked last time."""
+        cached = self._endpoint_cache.get(call_type)
+        if cached:
+            endpoints = [cached] + [e for e in endpoints if e != cached]
+        
+        for endpoint in endpoints:
+            try:
+                logger.debug("Trying {} endpoint: {}", call_type, endpoint)
+                response = await self._make_request("POST", endpoint, data)
+            except Exception as e:
+                logger.debug("{} endpoint {} failed: {}", call_type, endpoint, e)
+                continue
+            
+            if accept is None or accept(response):
+                self._endpoint_cache[call_type] = endpoint
+                return response
+        
+        return None
+    
+    async def _probe_base_urls(self, session: aiohttp.ClientSession):
+        """Probe all base URLs concurrently once and try reachable hosts first."""
+        self._base_urls_probed = True
+        timeout = aiohttp.ClientTimeout(total=PROBE_TIMEOUT)
+        
+        async def reachable(base_url: str) -> bool:
+            try:
+                async with session.head(base_url, timeout=timeout):
+                    return True
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                return False
+        
+        urls = list(self.base_urls)
+        results = await asyncio.gather(*(reachable(u) for u in urls))
+        
+        self.base_urls = [u for u, ok in zip(urls, results) if ok] + [u for u, ok in zip(urls, results) if not ok]
+        self.base_url = self.base_urls[0]
+        logger.debug("Base URL order after probe: {}", self.base_urls)
+    
+    async def _send(self, session: aiohttp.ClientSession, is_get: bool, url: str,
+                    data: Optional[Dict], body: Optional[bytes]) -> bytes:
+        """Send request and return the body, retrying with backoff on throttling and server errors."""
+        for attempt in range(MAX_RETRIES + 1):
+            # Only GET and POST are used by the Ozon API
+            if is_get:
+                request = session.get(url, params=data)
+            else:
+                request = session.post(url, data=body)
+            
+            async with request as response:
+                if response.status not in RETRY_STATUS_CODES or attempt == MAX_RETRIES:
+                    response.raise_for_status()
+                    return await response.read()
+                delay = _retry_delay(response.headers.get("Retry-After"), attempt)
+            await asyncio.sleep(delay)
+    
+    async def _make_request(self, method: str, endpoint: str, data: Dict = None) -> Dict:
+        """Make HTTP request to Ozon API with automatic fallback to alternative URLs."""
+        session = await self._get_session()
+        if not self._base_urls_probed:
+            await self._probe_base_urls(session)
+        
+        last_error = None
+        is_get = method.upper() == "GET"
+        body = _json_dumps(data) if data is not None and not is_get else None
+        
+        for base_url in list(self.base_urls):
+            url = f"{base_url}{endpoint}"
+            try:
+                logger.debug("Trying API request to: {}", url)
+                result = _json_loads(await self._send(session, is_get, url, data, body))
+                
+                # Если успешно, обновляем текущий базовый URL
+                self._promote_base_url(base_url)
+                return result
+            
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                # Keep only the description; the exception and its frames are released here
+                last_error = _describe_error(e)
+                logger.debug("API request failed for {}: {}", base_url, e)
+        
+        # Если все URL не работают
+        raise OzonAPIError(f"All API endpoints failed for endpoint: {endpoint} (last error: {last_error})")
+    
+    async def get_all_campaigns(self) -> List[Dict]:
+        """Get all advertising campaigns."""
+        cached = self.cache.get(("campaigns",))
+        if cached is not None:
+            return cached
+        
+        campaigns = await self._fetch_all_campaigns()
+        if campaigns is None:
+            # API unavailable, fall back to the last known campaign list
+            return self.cache.get(("campaigns",), allow_stale=True) or []
+        if campaigns:
+            self.cache.set(("campaigns",), campaigns, settings.campaigns_cache_ttl)
+        return campaigns
+    
+    async def _fetch_all_campaigns(self) -> Optional[List[Dict]]:
+        """Fetch all advertising campaigns from the API, None on failure."""
+        logger.info("Fetching all campaigns")
+        
+        try:
+            response = await self._probe_endpoints(
+                "campaigns_list", CAMPAIGN_LIST_ENDPOINTS, {},
+                accept=lambda r: bool(r.get("result", {}).get("campaigns"))
+            )
+            if response:
+                campaigns = response["result"]["campaigns"]
+                logger.info(f"Found {len(campaigns)} campaigns using {self._endpoint_cache['campaigns_list']}")
+                return campaigns
+            
+            # Если все endpoints не работают, попробуем базовый endpoint
+            logger.info("Trying base campaign endpoint")
+            response = await self._make_request("POST", "/v1/campaign/list", {})
+            campaigns = response.get("result", {}).get("campaigns", [])
+            
+            logger.info(f"Found {len(campaigns)} campaigns")
+            return campaigns
+        
+        except Exception as e:
+            logger.error(f"Failed to fetch campaigns: {e}")
+            return None
+    
+    async def get_campaign_stats(self, campaign_id: int, date_from: str, date_to: str) -> Dict:
+        """Get campaign statistics for specified period."""
+        key = ("stats", campaign_id, date_from, date_to)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        
+        stats = await self._fetch_campaign_stats(campaign_id, date_from, date_to)
+        if stats:
+            self.cache.set(key, stats, settings.stats_cache_ttl)
+        return stats
+    
+    async def _fetch_campaign_stats(self, campaign_id: int, date_from: str, date_to: str) -> Dict:
+        """Fetch campaign statistics from the API, raising OzonAPIError if it is unavailable."""
+        logger.debug("Fetching stats for campaign {} from {} to {}", campaign_id, date_from, date_to)
+        
+        data = _stats_request([campaign_id], date_from, date_to, "DATE")
+        
+        response = await self._probe_endpoints("statistics", CAMPAIGN_STATS_ENDPOINTS, data)
+        if not response:
+            raise OzonAPIError(f"All statistics endpoints failed for campaign {campaign_id}")
+        stats = response.get("result", {})
+        
+        if not stats:
+            logger.warning(f"No stats found for campaign {campaign_id}")
+            return {}
+        
+        return _split_campaign_stats([campaign_id], stats)[campaign_id]
+    
+    async def get_keyword_stats(self, campaign_id: int, date_from: str, date_to: str) -> List[Dict]:
+        """Get keyword statistics, raising OzonAPIError if the API is unavailable."""
+        key = ("keyword_stats", campaign_id, date_from, date_to)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        
+        keyword_stats = await self._fetch_keyword_stats(campaign_id, date_from, date_to)
+        if keyword_stats:
+            self.cache.set(key, keyword_stats, settings.stats_cache_ttl)
+        return keyword_stats
+    
+    async def _fetch_keyword_stats(self, campaign_id: int, date_from: str, date_to: str) -> List[Dict]:
+        """Fetch keyword statistics from the API."""
+        logger.debug("Fetching keyword stats for campaign {}", campaign_id)
+        
+        data = _stats_request([campaign_id], date_from, date_to, "KEYWORD")
+        
+        response = await self._make_request("POST", KEYWORD_STATS_ENDPOINT, data)
+        return _parse_keyword_stats(response)
+    
+    async def update_keyword_bid(self, campaign_id: int, keyword: str, new_bid: float) -> bool:
+        """Update keyword bid."""
+        return await self.update_keyword_bids(campaign_id, [{"keyword": keyword, "suggested_bid": new_bid}])
+    
+    async def update_keyword_bids(self, campaign_id: int, adjustments: List[Dict]) -> bool:
+        """Update bids for several keywords in a single request."""
+        if not adjustments:
+            return True
+        
+        logger.info(f"Updating bids for {len(adjustments)} keywords in campaign {campaign_id}")
+        
+        try:
+            data = {
+                "campaignId": campaign_id,
+                "keywords": [
+                    {"keyword": a["keyword"], "bid": a["suggested_bid"]}
+                    for a in adjustments
+                ]
+            }
+            
+            response = await self._make_request("POST", KEYWORD_BID_ENDPOINT, data)
+            
+            if response.get("result"):
+                logger.info(f"Successfully updated bids for {len(adjustments)} keywords")
+                self.invalidate(campaign_id)
+                return True
+            else:
+                logger.error(f"Failed to update bids: {response}")
+                return False
+        
+        except Exception as e:
+            logger.error(f"Error updating bids: {e}")
+            return False
+    
+    async def pause_keywords(self, campaign_id: int, keywords: List[str]) -> bool:
+        """Pause keywords in campaign."""
+        logger.info(f"Pausing {len(keywords)} keywords in campaign {campaign_id}")
+        
+        try:
+            data = {
+                "campaignId": campaign_id,
+                "keywords": [{"keyword": kw, "status": "PAUSED"} for kw in keywords]
+            }
+            
+            response = await self._make_request("POST", KEYWORD_STATUS_ENDPOINT, data)
+            
+            if response.get("result"):
+                logger.info("Successfully paused keywords")
+                self.invalidate(campaign_id)
+                return True
+            else:
+                logger.error(f"Failed to pause keywords: {response}")
+                return False
+        
+        except Exception as e:
+            logger.error(f"Error pausing keywords: {e}")
+            return False
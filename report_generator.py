@@ -1,15 +1,77 @@
 """Report generation module for Ozon advertising campaigns."""
+import heapq
+import json
 import os
 from datetime import datetime
+from itertools import islice
 from typing import Dict, List, Optional
-import pandas as pd
 from fpdf import FPDF
-from jinja2 import Template
-import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment
-from openpyxl.utils.dataframe import dataframe_to_rows
+from fpdf.enums import XPos, YPos
+try:
+    import orjson
+except ImportError:
+    orjson = None
+import xlsxwriter
 from loguru import logger
 from config import settings
+from data_analysis import ISSUE_HIGH_PERFORMANCE
+
+
+# Static HTML report shell, report data is injected as a JSON island
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "report_shell.html"), encoding="utf-8") as _f:
+    _HTML_SHELL = _f.read()
+
+# Summary sheet performance rows: label, value format, metric key
+_SUMMARY_ROWS = (
+    ("Общие расходы", "{:.2f} ₽", 'total_spend'),
+    ("Общая выручка", "{:.2f} ₽", 'total_revenue'),
+    ("Общий CTR", "{:.2f}%", 'overall_ctr'),
+    ("Общий CR", "{:.2f}%", 'overall_cr'),
+    ("Общий ДРР", "{:.2f}%", 'overall_drr'),
+    ("ROI", "{:.2f}", 'overall_roi'),
+    ("Всего кликов", "{:,}", 'total_clicks'),
+    ("Всего показов", "{:,}", 'total_impressions'),
+    ("Всего заказов", "{:,}", 'total_orders'),
+)
+
+# Excel cell formats, registered once per workbook
+_EXCEL_FORMATS = {
+    'summary_title': {'bold': True, 'font_size': 16},
+    'summary_header': {'bold': True, 'font_size': 12, 'bg_color': '#366092'},
+    'keywords_header': {'bold': True, 'font_color': '#FFFFFF', 'bg_color': '#366092', 'align': 'center'},
+    'pause': {'bg_color': '#FF6B6B'},
+    'increase_bid': {'bg_color': '#4ECDC4'},
+    'decrease_bid': {'bg_color': '#FFE66D'},
+    'monitor': {'bg_color': '#A8E6CF'},
+    'recommendations_title': {'bold': True, 'font_size': 14},
+    'critical': {'bold': True, 'font_color': '#FF0000'},
+    'high_performance': {'bold': True, 'font_color': '#008000'},
+    'bid_adjustment': {'bold': True, 'font_color': '#0066CC'},
+}
+
+# Keyword actions color-coded in the keywords sheet
+_COLORED_ACTIONS = frozenset({'pause', 'increase_bid', 'decrease_bid', 'monitor'})
+
+
+def _json_island(data: Dict) -> str:
+    """Serialize report data for embedding into an HTML <script> element."""
+    if orjson is not None:
+        text = orjson.dumps(data).decode('utf-8')
+    else:
+        text = json.dumps(data, ensure_ascii=False)
+    # Keep "</script>" and HTML comments inside strings from closing the element
+    return text.replace('<', '\\u003c')
+
+
+def _track_widths(widths: List[int], values) -> None:
+    """Widen tracked column widths to fit the non-empty values of a written row."""
+    for col, value in enumerate(values):
+        if col == len(widths):
+            widths.append(0)
+        if value:
+            width = len(str(value))
+            if width > widths[col]:
+                widths[col] = width
 
 
 class ReportGenerator:
@@ -31,77 +93,60 @@ class ReportGenerator:
         
         logger.info(f"Generating Excel report: {filepath}")
         
-        # Create workbook
-        wb = openpyxl.Workbook()
+        # Create workbook, rows are streamed to disk as they are written
+        wb = xlsxwriter.Workbook(filepath, {'constant_memory': True, 'strings_to_numbers': False})
         
-        # Remove default sheet
-        wb.remove(wb.active)
+        formats = {name: wb.add_format(props) for name, props in _EXCEL_FORMATS.items()}
         
         # Create summary sheet
-        self._create_summary_sheet(wb, campaign_summary)
+        self._create_summary_sheet(wb, formats, campaign_summary)
         
         # Create keywords analysis sheet
-        self._create_keywords_sheet(wb, keyword_analysis)
+        self._create_keywords_sheet(wb, formats, keyword_analysis)
         
         # Create recommendations sheet
-        self._create_recommendations_sheet(wb, campaign_summary, keyword_analysis)
+        self._create_recommendations_sheet(wb, formats, campaign_summary, keyword_analysis)
         
         # Save workbook
-        wb.save(filepath)
+        wb.close()
         logger.info(f"Excel report saved: {filepath}")
         
         return filepath
     
-    def _create_summary_sheet(self, workbook, campaign_summary: Dict):
+    def _create_summary_sheet(self, workbook, formats: Dict, campaign_summary: Dict):
         """Create campaign summary sheet."""
-        ws = workbook.create_sheet("Сводка кампании")
-        
-        # Headers styling
-        header_font = Font(bold=True, size=12)
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+        ws = workbook.add_worksheet("Сводка кампании")
+        widths = []
+        header_format = formats['summary_header']
         
         # Title
-        ws['A1'] = f"Отчёт по кампании {campaign_summary.get('campaign_id', 'N/A')}"
-        ws['A1'].font = Font(bold=True, size=16)
-        ws.merge_cells('A1:D1')
+        title = f"Отчёт по кампании {campaign_summary.get('campaign_id', 'N/A')}"
+        ws.merge_range(0, 0, 0, 3, title, formats['summary_title'])
+        _track_widths(widths, (title,))
         
         # Generation date
-        ws['A2'] = f"Дата создания: {datetime.now().strftime('%d.%m.%Y %H:%M')}"
-        ws.merge_cells('A2:D2')
+        generated = f"Дата создания: {datetime.now().strftime('%d.%m.%Y %H:%M')}"
+        ws.merge_range(1, 0, 1, 3, generated)
+        _track_widths(widths, (generated,))
         
         # Performance metrics
-        row = 4
-        ws[f'A{row}'] = "Основные показатели"
-        ws[f'A{row}'].font = header_font
-        ws[f'A{row}'].fill = header_fill
-        ws.merge_cells(f'A{row}:B{row}')
+        row = 3
+        ws.merge_range(row, 0, row, 1, "Основные показатели", header_format)
+        _track_widths(widths, ("Основные показатели",))
         
         metrics = campaign_summary.get('performance_metrics', {})
         
         row += 1
-        performance_data = [
-            ("Общие расходы", f"{metrics.get('total_spend', 0):.2f} ₽"),
-            ("Общая выручка", f"{metrics.get('total_revenue', 0):.2f} ₽"),
-            ("Общий CTR", f"{metrics.get('overall_ctr', 0):.2f}%"),
-            ("Общий CR", f"{metrics.get('overall_cr', 0):.2f}%"),
-            ("Общий ДРР", f"{metrics.get('overall_drr', 0):.2f}%"),
-            ("ROI", f"{metrics.get('overall_roi', 0):.2f}"),
-            ("Всего кликов", f"{metrics.get('total_clicks', 0):,}"),
-            ("Всего показов", f"{metrics.get('total_impressions', 0):,}"),
-            ("Всего заказов", f"{metrics.get('total_orders', 0):,}")
-        ]
-        
-        for metric_name, metric_value in performance_data:
-            ws[f'A{row}'] = metric_name
-            ws[f'B{row}'] = metric_value
+        for label, fmt, key in _SUMMARY_ROWS:
+            values = (label, fmt.format(metrics.get(key, 0)))
+            ws.write_row(row, 0, values)
+            _track_widths(widths, values)
             row += 1
         
         # Actions summary
         row += 2
-        ws[f'A{row}'] = "Необходимые действия"
-        ws[f'A{row}'].font = header_font
-        ws[f'A{row}'].fill = header_fill
-        ws.merge_cells(f'A{row}:B{row}')
+        ws.merge_range(row, 0, row, 1, "Необходимые действия", header_format)
+        _track_widths(widths, ("Необходимые действия",))
         
         actions = campaign_summary.get('actions_needed', {})
         row += 1
@@ -115,45 +160,33 @@ class ReportGenerator:
         
         for action, count in actions.items():
             if count > 0:
-                ws[f'A{row}'] = action_labels.get(action, action)
-                ws[f'B{row}'] = count
+                values = (action_labels.get(action, action), count)
+                ws.write_row(row, 0, values)
+                _track_widths(widths, values)
                 row += 1
         
         # Recommendations
         recommendations = campaign_summary.get('recommendations', [])
         if recommendations:
             row += 2
-            ws[f'A{row}'] = "Рекомендации"
-            ws[f'A{row}'].font = header_font
-            ws[f'A{row}'].fill = header_fill
-            ws.merge_cells(f'A{row}:D{row}')
+            ws.merge_range(row, 0, row, 3, "Рекомендации", header_format)
+            _track_widths(widths, ("Рекомендации",))
             
             for rec in recommendations:
                 row += 1
-                ws[f'A{row}'] = rec
-                ws.merge_cells(f'A{row}:D{row}')
+                ws.merge_range(row, 0, row, 3, rec)
+                _track_widths(widths, (rec,))
         
         # Auto-adjust column widths
-        for column_cells in ws.columns:
-            max_length = 0
-            column_letter = None
-            for cell in column_cells:
-                if hasattr(cell, 'column_letter'):
-                    column_letter = cell.column_letter
-                if cell.value:
-                    max_length = max(max_length, len(str(cell.value)))
-            if column_letter:
-                ws.column_dimensions[column_letter].width = min(max_length + 2, 50)
+        for col, width in enumerate(widths):
+            ws.set_column(col, col, min(width + 2, 50))
     
-    def _create_keywords_sheet(self, workbook, keyword_analysis: List[Dict]):
+    def _create_keywords_sheet(self, workbook, formats: Dict, keyword_analysis: List[Dict]):
         """Create keywords analysis sheet."""
-        ws = workbook.create_sheet("Анализ ключевых слов")
+        ws = workbook.add_worksheet("Анализ ключевых слов")
         
-        # Convert to DataFrame
-        df = pd.DataFrame(keyword_analysis)
-        
-        if df.empty:
-            ws['A1'] = "Нет данных для анализа"
+        if not keyword_analysis:
+            ws.write(0, 0, "Нет данных для анализа")
             return
         
         # Select and order columns
@@ -163,8 +196,8 @@ class ReportGenerator:
         ]
         
         # Filter existing columns
-        available_columns = [col for col in columns if col in df.columns]
-        df_filtered = df[available_columns]
+        present = set().union(*keyword_analysis)
+        available_columns = [col for col in columns if col in present]
         
         # Rename columns to Russian
         column_names = {
@@ -182,119 +215,110 @@ class ReportGenerator:
             'priority': 'Приоритет'
         }
         
-        df_filtered = df_filtered.rename(columns=column_names)
-        
-        # Add DataFrame to worksheet
-        for r in dataframe_to_rows(df_filtered, index=False, header=True):
-            ws.append(r)
-        
-        # Style header row
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        
-        for cell in ws[1]:
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = Alignment(horizontal="center")
+        # Header row
+        header = [column_names[col] for col in available_columns]
+        ws.write_row(0, 0, header, formats['keywords_header'])
         
         # Color-code action column
-        action_colors = {
-            'pause': PatternFill(start_color="FF6B6B", end_color="FF6B6B", fill_type="solid"),
-            'increase_bid': PatternFill(start_color="4ECDC4", end_color="4ECDC4", fill_type="solid"),
-            'decrease_bid': PatternFill(start_color="FFE66D", end_color="FFE66D", fill_type="solid"),
-            'monitor': PatternFill(start_color="A8E6CF", end_color="A8E6CF", fill_type="solid")
-        }
-        
-        action_col_idx = None
-        for idx, cell in enumerate(ws[1], 1):
-            if cell.value == 'Действие':
-                action_col_idx = idx
-                break
-        
-        if action_col_idx:
-            for row in ws.iter_rows(min_row=2, max_row=ws.max_row, 
-                                  min_col=action_col_idx, max_col=action_col_idx):
-                cell = row[0]
-                if cell.value in action_colors:
-                    cell.fill = action_colors[cell.value]
+        action_col_idx = available_columns.index('action') if 'action' in present else None
+        
+        # Write rows straight from the analysis records, tracking column widths on the way
+        widths = []
+        _track_widths(widths, header)
+        for row, keyword in enumerate(keyword_analysis, 1):
+            values = [keyword.get(col) for col in available_columns]
+            ws.write_row(row, 0, values)
+            _track_widths(widths, values)
+            if action_col_idx is not None:
+                action = values[action_col_idx]
+                if action in _COLORED_ACTIONS:
+                    ws.write(row, action_col_idx, action, formats[action])
         
         # Auto-adjust column widths
-        for column_cells in ws.columns:
-            max_length = 0
-            column_letter = None
-            for cell in column_cells:
-                if hasattr(cell, 'column_letter'):
-                    column_letter = cell.column_letter
-                if cell.value:
-                    max_length = max(max_length, len(str(cell.value)))
-            if column_letter:
-                ws.column_dimensions[column_letter].width = min(max_length + 2, 50)
+        for col, width in enumerate(widths):
+            ws.set_column(col, col, min(width + 2, 50))
     
-    def _create_recommendations_sheet(self, workbook, campaign_summary: Dict, keyword_analysis: List[Dict]):
+    def _create_recommendations_sheet(self, workbook, formats: Dict, campaign_summary: Dict,
+                                      keyword_analysis: List[Dict]):
         """Create detailed recommendations sheet."""
-        ws = workbook.create_sheet("Детальные рекомендации")
+        ws = workbook.add_worksheet("Детальные рекомендации")
+        widths = []
         
         # Title
-        ws['A1'] = "Детальные рекомендации по оптимизации"
-        ws['A1'].font = Font(bold=True, size=14)
-        ws.merge_cells('A1:C1')
-        
-        row = 3
+        title = "Детальные рекомендации по оптимизации"
+        ws.merge_range(0, 0, 0, 2, title, formats['recommendations_title'])
+        _track_widths(widths, (title,))
+        
+        row = 2
+        
+        # Split keywords into sections in a single pass
+        critical_keywords, high_performers, bid_adjustments = [], [], []
+        for keyword in keyword_analysis:
+            if keyword.get('priority', 0) >= 90:
+                critical_keywords.append(keyword)
+            if keyword.get('issue_flags', 0) & ISSUE_HIGH_PERFORMANCE:
+                high_performers.append(keyword)
+            if keyword.get('bid_adjustment', 0):
+                bid_adjustments.append(keyword)
         
         # Critical issues
-        critical_keywords = [k for k in keyword_analysis if k.get('priority', 0) >= 90]
         if critical_keywords:
-            ws[f'A{row}'] = "🔴 КРИТИЧЕСКИЕ ПРОБЛЕМЫ (требуют немедленного внимания)"
-            ws[f'A{row}'].font = Font(bold=True, color="FF0000")
-            ws.merge_cells(f'A{row}:C{row}')
+            heading = "🔴 КРИТИЧЕСКИЕ ПРОБЛЕМЫ (требуют немедленного внимания)"
+            ws.merge_range(row, 0, row, 2, heading, formats['critical'])
+            _track_widths(widths, (heading,))
             row += 1
             
-            for keyword in critical_keywords[:10]:  # Top 10
-                ws[f'A{row}'] = keyword.get('keyword', '')
-                ws[f'B{row}'] = keyword.get('recommendation', '')
-                ws[f'C{row}'] = f"Приоритет: {keyword.get('priority', 0)}"
+            for keyword in heapq.nlargest(10, critical_keywords, key=lambda k: k['priority']):  # Top 10
+                values = (
+                    keyword.get('keyword', ''),
+                    keyword.get('recommendation', ''),
+                    f"Приоритет: {keyword.get('priority', 0)}"
+                )
+                ws.write_row(row, 0, values)
+                _track_widths(widths, values)
                 row += 1
             row += 1
         
         # High-performance keywords
-        high_performers = [k for k in keyword_analysis if 'high_performance' in k.get('issues', [])]
         if high_performers:
-            ws[f'A{row}'] = "📈 ВЫСОКОЭФФЕКТИВНЫЕ КЛЮЧИ (можно масштабировать)"
-            ws[f'A{row}'].font = Font(bold=True, color="008000")
-            ws.merge_cells(f'A{row}:C{row}')
+            heading = "📈 ВЫСОКОЭФФЕКТИВНЫЕ КЛЮЧИ (можно масштабировать)"
+            ws.merge_range(row, 0, row, 2, heading, formats['high_performance'])
+            _track_widths(widths, (heading,))
             row += 1
             
             for keyword in high_performers[:10]:
-                ws[f'A{row}'] = keyword.get('keyword', '')
-                ws[f'B{row}'] = keyword.get('recommendation', '')
-                ws[f'C{row}'] = f"CTR: {keyword.get('ctr', 0):.2f}% | CR: {keyword.get('cr', 0):.2f}%"
+                values = (
+                    keyword.get('keyword', ''),
+                    keyword.get('recommendation', ''),
+                    f"CTR: {keyword.get('ctr', 0):.2f}% | CR: {keyword.get('cr', 0):.2f}%"
+                )
+                ws.write_row(row, 0, values)
+                _track_widths(widths, values)
                 row += 1
             row += 1
         
         # Bid adjustments
-        bid_adjustments = [k for k in keyword_analysis if k.get('bid_adjustment', 0) != 0]
         if bid_adjustments:
-            ws[f'A{row}'] = "💰 КОРРЕКТИРОВКА СТАВОК"
-            ws[f'A{row}'].font = Font(bold=True, color="0066CC")
-            ws.merge_cells(f'A{row}:C{row}')
+            heading = "💰 КОРРЕКТИРОВКА СТАВОК"
+            ws.merge_range(row, 0, row, 2, heading, formats['bid_adjustment'])
+            _track_widths(widths, (heading,))
             row += 1
             
             for keyword in bid_adjustments[:15]:
                 adjustment = keyword.get('bid_adjustment', 0)
                 direction = "↗️" if adjustment > 0 else "↘️"
-                ws[f'A{row}'] = keyword.get('keyword', '')
-                ws[f'B{row}'] = f"{direction} {abs(adjustment):.1f}%"
-                ws[f'C{row}'] = keyword.get('recommendation', '')
+                values = (
+                    keyword.get('keyword', ''),
+                    f"{direction} {abs(adjustment):.1f}%",
+                    keyword.get('recommendation', '')
+                )
+                ws.write_row(row, 0, values)
+                _track_widths(widths, values)
                 row += 1
         
         # Auto-adjust column widths
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                if cell.value:
-                    max_length = max(max_length, len(str(cell.value)))
-            ws.column_dimensions[column_letter].width = min(max_length + 2, 60)
+        for col, width in enumerate(widths):
+            ws.set_column(col, col, min(width + 2, 60))
     
     def generate_pdf_report(self, campaign_summary: Dict, filename: Optional[str] = None) -> str:
         """Generate PDF report with campaign summary."""
@@ -353,26 +377,8 @@ class ReportGenerator:
             pdf.set_font('DejaVu', '', 12)
             
             for rec in recommendations[:5]:  # Top 5 recommendations
-                # Word wrap for long recommendations
-                if len(rec) > 80:
-                    words = rec.split(' ')
-                    lines = []
-                    current_line = ""
-                    
-                    for word in words:
-                        if len(current_line + word) < 80:
-                            current_line += word + " "
-                        else:
-                            lines.append(current_line.strip())
-                            current_line = word + " "
-                    
-                    if current_line:
-                        lines.append(current_line.strip())
-                    
-                    for line in lines:
-                        pdf.cell(0, 8, f"• {line}", 0, 1)
-                else:
-                    pdf.cell(0, 8, f"• {rec}", 0, 1)
+                # multi_cell wraps long recommendations by rendered width
+                pdf.multi_cell(0, 8, f"• {rec}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
         
         # Save PDF
         pdf.output(filepath)
@@ -389,99 +395,21 @@ class ReportGenerator:
         
         filepath = os.path.join(self.output_dir, filename)
         
-        # HTML template
-        template_str = """
-        <!DOCTYPE html>
-        <html lang="ru">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>Отчёт по кампании {{ campaign_id }}</title>
-            <style>
-                body { font-family: Arial, sans-serif; margin: 20px; }
-                .header { text-align: center; margin-bottom: 30px; }
-                .metrics { display: grid; grid-template-columns: repeat(auto-fit, minmax(200px, 1fr)); gap: 20px; margin: 20px 0; }
-                .metric-card { background: #f5f5f5; padding: 15px; border-radius: 8px; }
-                .metric-value { font-size: 24px; font-weight: bold; color: #333; }
-                .metric-label { color: #666; margin-top: 5px; }
-                .recommendations { background: #e8f4f8; padding: 20px; border-radius: 8px; margin: 20px 0; }
-                .critical { background: #ffe6e6; border-left: 4px solid #ff4444; }
-                .success { background: #e6ffe6; border-left: 4px solid #44ff44; }
-                .warning { background: #fff3e0; border-left: 4px solid #ff9800; }
-                table { width: 100%; border-collapse: collapse; margin: 20px 0; }
-                th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }
-                th { background-color: #f2f2f2; }
-                .action-pause { background-color: #ffebee; }
-                .action-increase { background-color: #e8f5e8; }
-                .action-decrease { background-color: #fff3e0; }
-            </style>
-        </head>
-        <body>
-            <div class="header">
-                <h1>Отчёт по кампании {{ campaign_id }}</h1>
-                <p>Дата создания: {{ date }}</p>
-            </div>
-            
-            <div class="metrics">
-                <div class="metric-card">
-                    <div class="metric-value">{{ metrics.total_spend|round(2) }} ₽</div>
-                    <div class="metric-label">Общие расходы</div>
-                </div>
-                <div class="metric-card">
-                    <div class="metric-value">{{ metrics.overall_ctr|round(2) }}%</div>
-                    <div class="metric-label">CTR</div>
-                </div>
-                <div class="metric-card">
-                    <div class="metric-value">{{ metrics.overall_cr|round(2) }}%</div>
-                    <div class="metric-label">CR</div>
-                </div>
-                <div class="metric-card">
-                    <div class="metric-value">{{ metrics.overall_drr|round(2) }}%</div>
-                    <div class="metric-label">ДРР</div>
-                </div>
-            </div>
-            
-            {% if recommendations %}
-            <div class="recommendations">
-                <h2>Рекомендации</h2>
-                <ul>
-                {% for rec in recommendations %}
-                    <li>{{ rec }}</li>
-                {% endfor %}
-                </ul>
-            </div>
-            {% endif %}
-            
-            {% if critical_keywords %}
-            <div class="critical">
-                <h2>🔴 Критические проблемы</h2>
-                <ul>
-                {% for keyword in critical_keywords[:10] %}
-                    <li><strong>{{ keyword.keyword }}</strong>: {{ keyword.recommendation }}</li>
-                {% endfor %}
-                </ul>
-            </div>
-            {% endif %}
-        </body>
-        </html>
-        """
-        
-        template = Template(template_str)
-        
-        # Prepare data
-        critical_keywords = [k for k in keyword_analysis if k.get('priority', 0) >= 90]
-        
-        html_content = template.render(
-            campaign_id=campaign_summary.get('campaign_id', 'N/A'),
-            date=datetime.now().strftime('%d.%m.%Y %H:%M'),
-            metrics=campaign_summary.get('performance_metrics', {}),
-            recommendations=campaign_summary.get('recommendations', []),
-            critical_keywords=critical_keywords
-        )
+        # Prepare data, only the first 10 critical keywords are shown
+        data = {
+            'campaign_id': campaign_summary.get('campaign_id', 'N/A'),
+            'date': datetime.now().strftime('%d.%m.%Y %H:%M'),
+            'metrics': campaign_summary.get('performance_metrics', {}),
+            'recommendations': campaign_summary.get('recommendations', []),
+            'critical_keywords': [
+                {'keyword': k.get('keyword', ''), 'recommendation': k.get('recommendation', '')}
+                for k in islice((k for k in keyword_analysis if k.get('priority', 0) >= 90), 10)
+            ]
+        }
         
         # Save HTML
         with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+            f.write(_HTML_SHELL.replace('__DATA__', _json_island(data)))
         
         logger.info(f"HTML report saved: {filepath}")
         return filepath
\ No newline at end of file
@@ -1,8 +1,16 @@
 """Task scheduler for automated campaign optimization."""
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Callable
+from itertools import islice
+from operator import itemgetter
+from typing import Dict, Iterator, List, Optional, Callable
 import asyncio
+import concurrent.futures
+from concurrent.futures import ThreadPoolExecutor
 import inspect
+import json
+import os
+import threading
 try:
     from apscheduler.schedulers.asyncio import AsyncIOScheduler
     from apscheduler.triggers.cron import CronTrigger
@@ -15,6 +23,37 @@ except ImportError:
     ASYNC_AVAILABLE = False
 from loguru import logger
 from config import settings
+from ozon_api import format_api_date
+
+
+# Upper bound on alerts handled per monitoring run
+MAX_ALERTS = 500
+
+# Seconds to wait for an async callback to finish on the scheduler loop
+CALLBACK_TIMEOUT = 60
+
+# Campaign reports built in parallel by the weekly job
+REPORT_WORKERS = 4
+
+# Seconds a missed run may still start late, also across restarts
+MISFIRE_GRACE_TIME = 3600
+
+# Collapse missed runs into one, tolerate stalls and never overlap a job with itself
+JOB_DEFAULTS = {'coalesce': True, 'misfire_grace_time': MISFIRE_GRACE_TIME, 'max_instances': 1}
+
+
+@dataclass(frozen=True)
+class JobTick:
+    """Clock reading taken once at job start together with the job's date window."""
+    now: datetime
+    date_from: str
+    date_to: str
+    
+    @classmethod
+    def capture(cls, lookback: timedelta) -> "JobTick":
+        """Read the clock once and derive the date window ending today."""
+        now = datetime.now()
+        return cls(now, format_api_date(now - lookback), format_api_date(now))
 
 
 class CampaignScheduler:
@@ -22,13 +61,16 @@ class CampaignScheduler:
     
     def __init__(self, ozon_client=None, analyzer=None, keyword_manager=None, report_generator=None):
         """Initialize scheduler with required components."""
-        # Always use BackgroundScheduler for simplicity
-        try:
-            from apscheduler.schedulers.background import BackgroundScheduler
-            self.scheduler = BackgroundScheduler()
-        except ImportError:
-            logger.warning("APScheduler not available, scheduler disabled")
-            self.scheduler = None
+        # Event loop for scheduler timers and async callbacks, served by a daemon thread
+        # between start() and stop()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        
+        # Blocking job bodies run in the loop's default executor, async callbacks on the loop itself
+        if ASYNC_AVAILABLE:
+            self.scheduler = AsyncIOScheduler(job_defaults=JOB_DEFAULTS)
+        else:
+            self.scheduler = BackgroundScheduler(job_defaults=JOB_DEFAULTS)
         
         self.ozon_client = ozon_client
         self.analyzer = analyzer
@@ -36,25 +78,46 @@ class CampaignScheduler:
         self.report_generator = report_generator
         self.is_running = False
         
-        # Task callbacks
+        # Monitoring alert rules: (stats field, threshold, alert type, severity, message format)
+        self._alert_rules = (
+            ('drr', settings.critical_drr_threshold, 'high_drr', 'critical', "Высокий ДРР: {:.1f}%"),
+            ('spend', 10000, 'high_spend', 'warning', "Высокие расходы: {:.2f} ₽"),  # Spending over 10k rubles
+        )
+        
+        # Keyword analysis per (campaign_id, date_from, date_to) as (keyword_stats, analysis),
+        # reset on day rollover
+        self._analysis_cache: Dict[tuple, tuple] = {}
+        self._analysis_day: Optional[str] = None
+        
+        # Last completed run per job id, persisted so restarts know what already ran
+        self._state_lock = threading.Lock()
+        self._last_runs: Dict[str, str] = self._load_state()
+        
+        # Task callbacks as (is_coroutine_function, callback) pairs
         self.callbacks = {
             'on_analysis_complete': [],
             'on_optimization_complete': [],
             'on_report_generated': [],
-            'on_critical_issue': []
+            'on_critical_issue': [],
+            'on_alert': [],
+            # Fired on stop() while the loop still runs, so buffered notifications can be sent
+            'on_stop': []
         }
     
     def add_callback(self, event: str, callback: Callable):
         """Add callback for specific events."""
         if event in self.callbacks:
-            self.callbacks[event].append(callback)
+            # Store whether the callback is async once instead of checking on every dispatch
+            self.callbacks[event].append((inspect.iscoroutinefunction(callback), callback))
     
     def start(self):
         """Start the scheduler."""
         if not self.is_running and self.scheduler is not None:
             logger.info("Starting campaign scheduler")
             try:
-                self.scheduler.start()
+                self._start_loop()
+                # Started from the loop thread so AsyncIOScheduler binds to that loop
+                self._run_coro(self._start_scheduler())
                 self.is_running = True
                 
                 # Schedule default tasks
@@ -63,6 +126,7 @@ class CampaignScheduler:
             except Exception as e:
                 logger.error(f"Failed to start scheduler: {e}")
                 self.is_running = False
+                self._stop_loop()
         elif self.scheduler is None:
             logger.warning("Scheduler not available")
             self.is_running = False
@@ -77,6 +141,28 @@ class CampaignScheduler:
                 logger.error(f"Error stopping scheduler: {e}")
             finally:
                 self.is_running = False
+                self._dispatch('on_stop')
+                self._stop_loop()
+    
+    async def _start_scheduler(self):
+        """Start the APScheduler instance on the running loop."""
+        self.scheduler.start()
+    
+    def _start_loop(self):
+        """Create the event loop and its daemon thread."""
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self._loop.run_forever, name="scheduler-loop", daemon=True)
+        self._loop_thread.start()
+    
+    def _stop_loop(self):
+        """Stop the event loop after already queued callbacks (e.g. scheduler shutdown) and close it."""
+        if self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join()
+        self._loop.close()
+        self._loop = None
+        self._loop_thread = None
     
     def _schedule_default_tasks(self):
         """Schedule default recurring tasks."""
@@ -105,12 +191,14 @@ class CampaignScheduler:
         logger.info(f"Scheduling daily analysis at {hour:02d}:{minute:02d}")
         
         try:
+            trigger = CronTrigger(hour=hour, minute=minute)
             self.scheduler.add_job(
                 self._run_daily_analysis,
-                trigger=CronTrigger(hour=hour, minute=minute),
+                trigger=trigger,
                 id='daily_analysis',
                 name='Daily Campaign Analysis',
-                replace_existing=True
+                replace_existing=True,
+                **self._catch_up('daily_analysis', trigger)
             )
         except Exception as e:
             logger.error(f"Failed to schedule daily analysis: {e}")
@@ -119,12 +207,14 @@ class CampaignScheduler:
         """Schedule weekly report generation (0=Monday, 6=Sunday)."""
         logger.info(f"Scheduling weekly report on day {day_of_week} at {hour:02d}:{minute:02d}")
         
+        trigger = CronTrigger(day_of_week=day_of_week, hour=hour, minute=minute)
         self.scheduler.add_job(
             self._run_weekly_report,
-            trigger=CronTrigger(day_of_week=day_of_week, hour=hour, minute=minute),
+            trigger=trigger,
             id='weekly_report',
             name='Weekly Campaign Report',
-            replace_existing=True
+            replace_existing=True,
+            **self._catch_up('weekly_report', trigger)
         )
     
     def schedule_monitoring(self, interval_hours: int = 1):
@@ -147,25 +237,122 @@ class CampaignScheduler:
         
         logger.info(f"Scheduling optimization at {hour:02d}:{minute:02d}")
         
+        trigger = CronTrigger(hour=hour, minute=minute)
         self.scheduler.add_job(
             self._run_optimization,
-            trigger=CronTrigger(hour=hour, minute=minute),
+            trigger=trigger,
             id='optimization',
             name='Campaign Optimization',
-            replace_existing=True
+            replace_existing=True,
+            **self._catch_up('optimization', trigger)
         )
     
-    def _run_coro(self, coro):
-        """Safely run a coroutine in its own event loop."""
+    def _load_state(self) -> Dict[str, str]:
+        """Read last completed job runs from the state file."""
         try:
-            asyncio.run(coro)
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
+            with open(settings.scheduler_state_file, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to read scheduler state: {e}")
+            return {}
+    
+    def _mark_run(self, job_id: str, tick: JobTick):
+        """Record a completed job run and persist the state file atomically."""
+        with self._state_lock:
+            self._last_runs[job_id] = tick.now.isoformat()
+            path = settings.scheduler_state_file
             try:
-                loop.run_until_complete(coro)
-            finally:
-                loop.close()
+                os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self._last_runs, f)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning(f"Failed to save scheduler state: {e}")
+    
+    def _catch_up(self, job_id: str, trigger) -> Dict:
+        """Schedule a run missed while the process was down, if still within the grace time."""
+        now = datetime.now(trigger.timezone)
+        missed = trigger.get_next_fire_time(None, now - timedelta(seconds=MISFIRE_GRACE_TIME))
+        if missed is None or missed > now:
+            return {}
+        
+        last_run = self._last_runs.get(job_id)
+        if last_run and datetime.fromisoformat(last_run) >= missed.replace(tzinfo=None):
+            return {}
+        
+        logger.info(f"Catching up missed {job_id} run scheduled for {missed:%Y-%m-%d %H:%M}")
+        return {'next_run_time': missed}
+    
+    def _run_coro(self, coro):
+        """Run a coroutine on the scheduler loop and wait for its result."""
+        if self._loop is None:
+            # Job invoked directly while the scheduler is stopped
+            return asyncio.run(coro)
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result(timeout=CALLBACK_TIMEOUT)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
 
+    def _dispatch(self, event: str, *args):
+        """Call every callback registered for an event, logging failures."""
+        async_callbacks = []
+        for is_coroutine, callback in self.callbacks[event]:
+            if is_coroutine:
+                async_callbacks.append(callback)
+                continue
+            try:
+                callback(*args)
+            except Exception as e:
+                logger.error(f"Callback error ({event}): {e}")
+        
+        # Async callbacks run concurrently in a single hop to the scheduler loop
+        if async_callbacks:
+            try:
+                self._run_coro(self._gather_callbacks(event, async_callbacks, args))
+            except Exception as e:
+                logger.error(f"Callback error ({event}): {e}")
+    
+    @staticmethod
+    async def _gather_callbacks(event: str, callbacks: List[Callable], args: tuple):
+        """Await async callbacks together and log the ones that raised."""
+        results = await asyncio.gather(*(callback(*args) for callback in callbacks), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Callback error ({event}): {result}")
+    
+    def _fetch_campaign_data(self, campaign_ids: List[int], date_from: str, date_to: str,
+                             with_keywords: bool = True) -> List[tuple]:
+        """Fetch (stats, keyword_stats) for campaigns concurrently, preserving order."""
+        stats = self.ozon_client.get_stats_for_campaigns(campaign_ids, date_from, date_to)
+        if with_keywords:
+            keyword_stats = self.ozon_client.get_keyword_stats_batch(campaign_ids, date_from, date_to)
+        else:
+            keyword_stats = [[] for _ in campaign_ids]
+        return list(zip(stats, keyword_stats))
+    
+    def _analyze_keywords(self, campaign_id: int, date_from: str, date_to: str,
+                          keyword_stats: List[Dict]) -> List[Dict]:
+        """Analyze campaign keywords, reusing the result for the same window and stats payload."""
+        if date_to != self._analysis_day:
+            self._analysis_cache = {}
+            self._analysis_day = date_to
+        
+        key = (campaign_id, date_from, date_to)
+        cached = self._analysis_cache.get(key)
+        # The client returns the same cached list while its keyword stats are fresh
+        if cached is not None and cached[0] is keyword_stats:
+            logger.debug("Reusing keyword analysis for campaign {}", campaign_id)
+            return cached[1]
+        
+        analysis = self.analyzer.analyze_keywords(keyword_stats)
+        self._analysis_cache[key] = (keyword_stats, analysis)
+        return analysis
+    
     def _run_daily_analysis(self):
         """Run daily campaign analysis (synchronous wrapper)."""
         logger.info("Running scheduled daily analysis")
@@ -179,18 +366,16 @@ class CampaignScheduler:
             campaigns = self.ozon_client.get_all_campaigns()
             
             results = []
-            date_to = datetime.now().strftime('%Y-%m-%d')
-            date_from = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
+            tick = JobTick.capture(timedelta(days=7))
+            date_from, date_to = tick.date_from, tick.date_to
             
-            for campaign in campaigns[:5]:  # Limit to 5 campaigns
-                campaign_id = str(campaign.get('id', ''))
-                
-                # Get campaign stats
-                stats = self.ozon_client.get_campaign_stats(campaign_id, date_from, date_to)
-                keyword_stats = self.ozon_client.get_keyword_stats(campaign_id, date_from, date_to)
-                
+            campaigns = campaigns[:5]  # Limit to 5 campaigns
+            campaign_ids = [int(campaign.get('id', 0)) for campaign in campaigns]
+            campaign_data = self._fetch_campaign_data(campaign_ids, date_from, date_to)
+            
+            for campaign, campaign_id, (stats, keyword_stats) in zip(campaigns, campaign_ids, campaign_data):
                 # Analyze keywords
-                analysis = self.analyzer.analyze_keywords(keyword_stats)
+                analysis = self._analyze_keywords(campaign_id, date_from, date_to, keyword_stats)
                 summary = self.analyzer.get_campaign_summary(stats, analysis)
                 
                 results.append({
@@ -201,21 +386,15 @@ class CampaignScheduler:
                 })
                 
                 # Check for critical issues
-                critical_issues = [k for k in analysis if k.get('priority', 0) >= 90]
+                _, _, critical_issues = self.analyzer.partition(analysis)
                 if critical_issues:
                     # Handle critical issues (callbacks may be async)
                     self._handle_critical_issues(campaign_id, critical_issues)
             
             # Trigger callbacks
-            for callback in self.callbacks['on_analysis_complete']:
-                try:
-                    if inspect.iscoroutinefunction(callback):
-                        self._run_coro(callback(results))
-                    else:
-                        callback(results)
-                except Exception as e:
-                    logger.error(f"Callback error: {e}")
+            self._dispatch('on_analysis_complete', results)
             
+            self._mark_run('daily_analysis', tick)
             logger.info(f"Daily analysis completed for {len(results)} campaigns")
             
         except Exception as e:
@@ -231,47 +410,53 @@ class CampaignScheduler:
                 return
             
             campaigns = self.ozon_client.get_all_campaigns()
-            date_to = datetime.now().strftime('%Y-%m-%d')
-            date_from = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
+            tick = JobTick.capture(timedelta(days=7))
+            date_from, date_to = tick.date_from, tick.date_to
             
-            reports = []
+            # Limit to 3 campaigns for weekly reports
+            campaign_ids = [int(campaign.get('id', 0)) for campaign in campaigns[:3]]
+            campaign_data = self._fetch_campaign_data(campaign_ids, date_from, date_to)
             
-            for campaign in campaigns[:3]:  # Limit to 3 campaigns for weekly reports
-                campaign_id = str(campaign.get('id', ''))
-                
-                # Get data
-                stats = self.ozon_client.get_campaign_stats(campaign_id, date_from, date_to)
-                keyword_stats = self.ozon_client.get_keyword_stats(campaign_id, date_from, date_to)
-                
-                # Analyze
-                analysis = self.analyzer.analyze_keywords(keyword_stats)
-                summary = self.analyzer.get_campaign_summary(stats, analysis)
-                
-                # Generate reports
-                excel_path = self.report_generator.generate_excel_report(summary, analysis)
-                pdf_path = self.report_generator.generate_pdf_report(summary)
-                
-                reports.append({
-                    'campaign_id': campaign_id,
-                    'excel_path': excel_path,
-                    'pdf_path': pdf_path
-                })
+            # Build campaign reports concurrently, preserving order
+            reports = []
+            if campaign_ids:
+                with ThreadPoolExecutor(max_workers=min(REPORT_WORKERS, len(campaign_ids))) as executor:
+                    futures = [
+                        executor.submit(self._build_campaign_report, campaign_id, tick, stats, keyword_stats)
+                        for campaign_id, (stats, keyword_stats) in zip(campaign_ids, campaign_data)
+                    ]
+                    reports = [future.result() for future in futures]
             
             # Trigger callbacks
-            for callback in self.callbacks['on_report_generated']:
-                try:
-                    if inspect.iscoroutinefunction(callback):
-                        self._run_coro(callback(reports))
-                    else:
-                        callback(reports)
-                except Exception as e:
-                    logger.error(f"Report callback error: {e}")
+            self._dispatch('on_report_generated', reports)
             
+            self._mark_run('weekly_report', tick)
             logger.info(f"Weekly reports generated for {len(reports)} campaigns")
             
         except Exception as e:
             logger.error(f"Weekly report generation failed: {e}")
     
+    def _build_campaign_report(self, campaign_id: int, tick: JobTick,
+                               stats: Dict, keyword_stats: List[Dict]) -> Dict:
+        """Analyze one campaign and write its Excel and PDF reports."""
+        analysis = self._analyze_keywords(campaign_id, tick.date_from, tick.date_to, keyword_stats)
+        summary = self.analyzer.get_campaign_summary(stats, analysis)
+        
+        # Campaign id in file names keeps reports of one run apart
+        timestamp = tick.now.strftime("%Y%m%d_%H%M%S")
+        excel_path = self.report_generator.generate_excel_report(
+            summary, analysis, filename=f"ozon_campaign_report_{campaign_id}_{timestamp}.xlsx"
+        )
+        pdf_path = self.report_generator.generate_pdf_report(
+            summary, filename=f"ozon_campaign_summary_{campaign_id}_{timestamp}.pdf"
+        )
+        
+        return {
+            'campaign_id': campaign_id,
+            'excel_path': excel_path,
+            'pdf_path': pdf_path
+        }
+    
     def _run_monitoring(self):
         """Run campaign monitoring (synchronous wrapper)."""
         logger.info("Running scheduled monitoring")
@@ -280,40 +465,47 @@ class CampaignScheduler:
             if not self.ozon_client:
                 return
             
+            # Nobody consumes alerts, don't spend API quota on stats
+            if not self.callbacks['on_alert']:
+                logger.info("No alert consumers registered, skipping monitoring")
+                return
+            
             campaigns = self.ozon_client.get_all_campaigns()
-            date_to = datetime.now().strftime('%Y-%m-%d')
-            date_from = (datetime.now() - timedelta(hours=24)).strftime('%Y-%m-%d')
+            tick = JobTick.capture(timedelta(hours=24))
+            date_from, date_to = tick.date_from, tick.date_to
             
-            alerts = []
+            campaign_ids = [int(campaign.get('id', 0)) for campaign in campaigns]
             
-            for campaign in campaigns:
-                campaign_id = str(campaign.get('id', ''))
-                stats = self.ozon_client.get_campaign_stats(campaign_id, date_from, date_to)
-                
-                # Check for alerts
-                if stats.get('drr', 0) > 50:
-                    alerts.append({
-                        'type': 'high_drr',
-                        'campaign_id': campaign_id,
-                        'message': f"Высокий ДРР: {stats['drr']:.1f}%",
-                        'severity': 'critical'
-                    })
-                
-                if stats.get('spend', 0) > 10000:  # Spending over 10k rubles
-                    alerts.append({
-                        'type': 'high_spend',
-                        'campaign_id': campaign_id,
-                        'message': f"Высокие расходы: {stats['spend']:.2f} ₽",
-                        'severity': 'warning'
-                    })
+            alerts = []
+            for alert in islice(self._iter_alerts(campaign_ids, date_from, date_to), MAX_ALERTS):
+                alerts.append(alert)
+                logger.debug("Monitoring alert for campaign {}: {}", alert['campaign_id'], alert['message'])
             
             if alerts:
                 logger.warning(f"Found {len(alerts)} monitoring alerts")
-                # Handle alerts (could send to Telegram, email, etc.)
+                
+                # Trigger alert callbacks
+                self._dispatch('on_alert', alerts)
             
         except Exception as e:
             logger.error(f"Monitoring failed: {e}")
     
+    def _iter_alerts(self, campaign_ids: List[int], date_from: str, date_to: str) -> Iterator[Dict]:
+        """Yield monitoring alerts for campaigns that break an alert rule."""
+        campaign_data = self._fetch_campaign_data(campaign_ids, date_from, date_to, with_keywords=False)
+        alert_rules = self._alert_rules
+        
+        for campaign_id, (stats, _) in zip(campaign_ids, campaign_data):
+            for field, threshold, alert_type, severity, message in alert_rules:
+                value = stats.get(field, 0)
+                if value > threshold:
+                    yield {
+                        'type': alert_type,
+                        'campaign_id': campaign_id,
+                        'message': message.format(value),
+                        'severity': severity
+                    }
+    
     def _run_optimization(self):
         """Run automated optimization (synchronous wrapper)."""
         logger.info("Running scheduled optimization")
@@ -328,23 +520,29 @@ class CampaignScheduler:
                 return
             
             campaigns = self.ozon_client.get_all_campaigns()
-            date_to = datetime.now().strftime('%Y-%m-%d')
-            date_from = (datetime.now() - timedelta(days=3)).strftime('%Y-%m-%d')
+            tick = JobTick.capture(timedelta(days=3))
+            date_from, date_to = tick.date_from, tick.date_to
             
+            # Per-campaign results are only collected when someone listens for them
+            collect_results = bool(self.callbacks['on_optimization_complete'])
             optimization_results = []
+            total_actions = 0
             
-            for campaign in campaigns[:2]:  # Limit to 2 campaigns for auto-optimization
-                campaign_id = str(campaign.get('id', ''))
+            # Limit to 2 campaigns for auto-optimization, keyword stats fetched concurrently
+            campaign_ids = [int(campaign.get('id', 0)) for campaign in campaigns[:2]]
+            keyword_stats_batch = self.ozon_client.get_keyword_stats_batch(campaign_ids, date_from, date_to)
+            
+            for campaign_id, keyword_stats in zip(campaign_ids, keyword_stats_batch):
+                # Analyze
+                analysis = self._analyze_keywords(campaign_id, date_from, date_to, keyword_stats)
                 
-                # Get data and analyze
-                keyword_stats = self.ozon_client.get_keyword_stats(campaign_id, date_from, date_to)
-                analysis = self.analyzer.analyze_keywords(keyword_stats)
+                to_pause, bid_candidates, _ = self.analyzer.partition(analysis)
                 
                 # Apply optimizations
                 actions_taken = 0
                 
                 # Pause critical keywords
-                pause_keywords = [k['keyword'] for k in analysis if k['action'] == 'pause']
+                pause_keywords = list(map(itemgetter('keyword'), to_pause))
                 if pause_keywords:
                     success = self.ozon_client.pause_keywords(campaign_id, pause_keywords)
                     if success:
@@ -352,66 +550,59 @@ class CampaignScheduler:
                         logger.info(f"Paused {len(pause_keywords)} keywords in campaign {campaign_id}")
                 
                 # Adjust bids (only for high-confidence cases)
-                bid_adjustments = self.keyword_manager.suggest_bid_adjustments(analysis)
+                bid_adjustments = self.keyword_manager.suggest_bid_adjustments(bid_candidates)
                 high_confidence_adjustments = [b for b in bid_adjustments if b['priority'] >= 70]
                 
-                for adjustment in high_confidence_adjustments[:5]:  # Limit to 5 bid changes
-                    success = self.ozon_client.update_keyword_bid(
-                        campaign_id, 
-                        adjustment['keyword'], 
-                        adjustment['suggested_bid']
-                    )
+                bids_to_apply = high_confidence_adjustments[:5]  # Limit to 5 bid changes
+                if bids_to_apply:
+                    success = self.ozon_client.update_keyword_bids(campaign_id, bids_to_apply)
                     if success:
-                        actions_taken += 1
+                        actions_taken += len(bids_to_apply)
                 
-                optimization_results.append({
-                    'campaign_id': campaign_id,
-                    'actions_taken': actions_taken,
-                    'paused_keywords': len(pause_keywords),
-                    'bid_adjustments': len(high_confidence_adjustments)
-                })
+                total_actions += actions_taken
+                if collect_results:
+                    optimization_results.append({
+                        'campaign_id': campaign_id,
+                        'actions_taken': actions_taken,
+                        'paused_keywords': len(pause_keywords),
+                        'bid_adjustments': len(high_confidence_adjustments)
+                    })
             
             # Trigger callbacks
-            for callback in self.callbacks['on_optimization_complete']:
-                try:
-                    if inspect.iscoroutinefunction(callback):
-                        self._run_coro(callback(optimization_results))
-                    else:
-                        callback(optimization_results)
-                except Exception as e:
-                    logger.error(f"Optimization callback error: {e}")
+            self._dispatch('on_optimization_complete', optimization_results)
             
-            total_actions = sum(r['actions_taken'] for r in optimization_results)
+            self._mark_run('optimization', tick)
             logger.info(f"Optimization completed: {total_actions} actions taken")
             
         except Exception as e:
             logger.error(f"Optimization failed: {e}")
     
-    def _handle_critical_issues(self, campaign_id: str, critical_issues: List[Dict]):
+    def _handle_critical_issues(self, campaign_id: int, critical_issues: List[Dict]):
         """Handle critical issues found during analysis (sync)."""
         logger.warning(f"Found {len(critical_issues)} critical issues in campaign {campaign_id}")
         
         # Trigger critical issue callbacks
-        for callback in self.callbacks['on_critical_issue']:
-            try:
-                if inspect.iscoroutinefunction(callback):
-                    self._run_coro(callback(campaign_id, critical_issues))
-                else:
-                    callback(campaign_id, critical_issues)
-            except Exception as e:
-                logger.error(f"Critical issue callback error: {e}")
+        self._dispatch('on_critical_issue', campaign_id, critical_issues)
     
-    def get_scheduled_jobs(self) -> List[Dict]:
-        """Get list of currently scheduled jobs."""
-        jobs = []
+    def iter_scheduled_jobs(self) -> Iterator[Dict]:
+        """Yield currently scheduled jobs one by one."""
+        if self.scheduler is None:
+            return
+        
         for job in self.scheduler.get_jobs():
-            jobs.append({
+            next_run = job.next_run_time
+            yield {
                 'id': job.id,
                 'name': job.name,
-                'next_run_time': job.next_run_time.isoformat() if job.next_run_time else None,
+                'next_run_time': next_run.isoformat() if next_run else None,
+                # Pre-formatted for chat output
+                'next_run_display': next_run.strftime('%d.%m.%Y %H:%M') if next_run else None,
                 'trigger': str(job.trigger)
-            })
-        return jobs
+            }
+    
+    def get_scheduled_jobs(self) -> List[Dict]:
+        """Get list of currently scheduled jobs."""
+        return list(self.iter_scheduled_jobs())
     
     def remove_job(self, job_id: str):
         """Remove a scheduled job."""
@@ -1,11 +1,214 @@
 """Telegram bot integration for Ozon Ads management."""
 import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
-import telebot
+from telebot.async_telebot import AsyncTeleBot
 from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
 from loguru import logger
 from config import settings
+from ozon_api import format_api_date
+
+
+# Seconds getUpdates waits server-side for new updates
+LONG_POLL_TIMEOUT = 30
+
+# Telegram limit on the length of a single message
+MESSAGE_LIMIT = 4096
+
+# Reports rendered at the same time; each one occupies a worker thread
+REPORT_CONCURRENCY = 2
+
+# Critical issues reported within this many seconds are sent as one digest
+CRITICAL_DIGEST_WINDOW = 2.0
+# Campaigns listed in full in a critical digest, the rest are only counted
+CRITICAL_DIGEST_MAX_CAMPAIGNS = 20
+
+# Multi-step user sessions kept in memory, idle ones expire after USER_SESSION_TTL seconds
+USER_SESSION_LIMIT = 10_000
+USER_SESSION_TTL = 3600
+
+# Days of statistics used for on-demand analysis
+ANALYSIS_LOOKBACK_DAYS = 7
+
+
+def _timestamp(dt: datetime) -> str:
+    """Format datetime as DD.MM.YYYY HH:MM for message footers."""
+    return f"{dt.day:02d}.{dt.month:02d}.{dt.year} {dt.hour:02d}:{dt.minute:02d}"
+
+
+def _analysis_period() -> tuple:
+    """Return (date_from, date_to) for the analysis lookback, reading the clock once."""
+    now = datetime.now()
+    return format_api_date(now - timedelta(days=ANALYSIS_LOOKBACK_DAYS)), format_api_date(now)
+
+
+# Static command replies and keyboards, built once
+_WELCOME_TEXT = """
+🤖 <b>Ozon Ads Bot</b>
+
+Добро пожаловать! Я помогу вам управлять рекламными кампаниями на Ozon.
+
+<b>Доступные команды:</b>
+/help - список всех команд
+/status - статус системы
+/campaigns - список кампаний
+/analyze - анализ кампании
+/optimize - оптимизация кампании
+/report - генерация отчёта
+/schedule - управление расписанием
+/alerts - настройка уведомлений
+        """
+
+_HELP_TEXT = """
+<b>📋 Команды Ozon Ads Bot</b>
+
+<b>Основные:</b>
+/campaigns - показать все кампании
+/analyze - анализ эффективности
+/optimize - оптимизация кампаний
+/report - создать отчёт
+
+<b>Автоматизация:</b>
+/schedule - настроить расписание
+/alerts - уведомления о проблемах
+
+<b>Служебные:</b>
+/status - статус подключения
+/help - эта справка
+
+<b>💡 Быстрые действия:</b>
+• Используйте кнопки для удобного управления
+• Бот автоматически уведомляет о критических проблемах
+• Отчёты генерируются в Excel и PDF форматах
+        """
+
+_ALERTS_TEXT = """
+🔔 <b>Настройка уведомлений</b>
+
+<b>Автоматические уведомления:</b>
+• ДРР > 50% - критический уровень
+• Расходы > 10,000₽ в день
+• Ключи без заказов при >30 кликах
+• Завершение автооптимизации
+
+<b>Еженедельные отчёты:</b>
+• Понедельник в 10:00
+• Сводка по всем кампаниям
+• Рекомендации по оптимизации
+
+Уведомления приходят автоматически при обнаружении проблем.
+        """
+
+_OPTIMIZE_PROMPT = (
+    "⚙️ <b>Выберите тип оптимизации:</b>\n\n"
+    "🔴 <b>Отключение ключей</b> - отключает неэффективные ключевые слова\n"
+    "📈 <b>Ставки</b> - корректирует ставки по алгоритму\n"
+    "🚀 <b>Полная</b> - все действия сразу"
+)
+
+# Campaign status markers in /campaigns, anything else is shown as ⚪
+_STATUS_EMOJI = {"active": "🟢", "paused": "🔴"}
+
+# Report formats produced for each report type
+_REPORT_EXCEL_TYPES = frozenset({"excel", "full"})
+_REPORT_PDF_TYPES = frozenset({"pdf", "full"})
+
+# Compact callback_data tags ("<tag>_<arg>"), Telegram caps callback_data at 64 bytes
+CB_ANALYZE = "a"
+CB_OPTIMIZE = "o"
+CB_REPORT = "r"
+CB_RUN_ANALYSIS = "ra"
+CB_RUN_REPORT = "rr"
+
+_OPTIMIZE_MARKUP = InlineKeyboardMarkup()
+_OPTIMIZE_MARKUP.add(InlineKeyboardButton("🔴 Отключить неэффективные ключи", callback_data=f"{CB_OPTIMIZE}_pause"))
+_OPTIMIZE_MARKUP.add(InlineKeyboardButton("📈 Скорректировать ставки", callback_data=f"{CB_OPTIMIZE}_bids"))
+_OPTIMIZE_MARKUP.add(InlineKeyboardButton("🚀 Полная оптимизация", callback_data=f"{CB_OPTIMIZE}_full"))
+
+_REPORT_MARKUP = InlineKeyboardMarkup()
+_REPORT_MARKUP.add(InlineKeyboardButton("📊 Excel отчёт", callback_data=f"{CB_REPORT}_excel"))
+_REPORT_MARKUP.add(InlineKeyboardButton("📄 PDF отчёт", callback_data=f"{CB_REPORT}_pdf"))
+_REPORT_MARKUP.add(InlineKeyboardButton("📈 Полный отчёт (Excel + PDF)", callback_data=f"{CB_REPORT}_full"))
+
+_SCHEDULE_MARKUP = InlineKeyboardMarkup()
+_SCHEDULE_MARKUP.add(InlineKeyboardButton("▶️ Запустить анализ", callback_data=CB_RUN_ANALYSIS))
+_SCHEDULE_MARKUP.add(InlineKeyboardButton("📊 Создать отчёт", callback_data=CB_RUN_REPORT))
+
+
+def _pack_messages(texts: List[str]) -> List[str]:
+    """Join buffered messages into as few chunks under MESSAGE_LIMIT as possible."""
+    chunks = []
+    current = ""
+    for text in texts:
+        # A single oversized message is split on character boundaries
+        while len(text) > MESSAGE_LIMIT:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(text[:MESSAGE_LIMIT])
+            text = text[MESSAGE_LIMIT:]
+        
+        if not current:
+            current = text
+        elif len(current) + 2 + len(text) <= MESSAGE_LIMIT:
+            current = f"{current}\n\n{text}"
+        else:
+            chunks.append(current)
+            current = text
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _format_critical_issue(campaign_id: int, issues: List[Dict]) -> str:
+    """Format one campaign's section of a critical issue notification."""
+    lines = [f"Кампания: {campaign_id}", f"Проблем найдено: {len(issues)}", "", "<b>Топ проблемы:</b>"]
+    lines.extend(f"• {issue['keyword']}: {issue['recommendation']}" for issue in issues[:3])
+    return "\n".join(lines)
+
+
+class _SessionStore(MutableMapping):
+    """Dict-like store of user sessions; entries expire ttl seconds after the last write."""
+    
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # key -> (expires_at, value), oldest write first
+        self._data: "OrderedDict" = OrderedDict()
+    
+    def _prune(self):
+        """Drop expired entries from the oldest end."""
+        now = time.monotonic()
+        while self._data:
+            expires_at, _ = next(iter(self._data.values()))
+            if expires_at >= now:
+                break
+            self._data.popitem(last=False)
+    
+    def __getitem__(self, key):
+        self._prune()
+        return self._data[key][1]
+    
+    def __setitem__(self, key, value):
+        self._data.pop(key, None)
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._prune()
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+    
+    def __delitem__(self, key):
+        del self._data[key]
+    
+    def __iter__(self):
+        self._prune()
+        return iter(list(self._data))
+    
+    def __len__(self):
+        self._prune()
+        return len(self._data)
 
 
 class TelegramBot:
@@ -19,7 +222,7 @@ class TelegramBot:
             self.bot = None
             return
         
-        self.bot = telebot.TeleBot(settings.telegram_bot_token)
+        self.bot = AsyncTeleBot(settings.telegram_bot_token)
         self.chat_id = settings.telegram_chat_id
         
         # Components
@@ -32,8 +235,26 @@ class TelegramBot:
         # Setup handlers
         self._setup_handlers()
         
-        # User sessions for multi-step operations
-        self.user_sessions = {}
+        # User sessions for multi-step operations, bounded and expiring
+        self.user_sessions = _SessionStore(USER_SESSION_LIMIT, USER_SESSION_TTL)
+        
+        # Bounds CPU-heavy Excel/PDF rendering across simultaneous /report requests
+        self._report_sem = asyncio.Semaphore(REPORT_CONCURRENCY)
+        
+        # Inline keyboard callbacks: exact callback data first, then "<prefix>_<arg>"
+        self._callback_handlers = {
+            CB_RUN_ANALYSIS: lambda _, chat_id: self._run_manual_analysis(chat_id),
+            CB_RUN_REPORT: lambda _, chat_id: self._generate_report("excel", chat_id),
+            CB_ANALYZE: lambda arg, chat_id: self._analyze_campaign(int(arg), chat_id),
+            CB_OPTIMIZE: self._run_optimization,
+            CB_REPORT: self._generate_report,
+        }
+        
+        # Batched notifications per chat and background send tasks in flight
+        self._outbox: Dict[str, List[str]] = {}
+        # Critical issues waiting for the digest window to close
+        self._critical_buffer: List[tuple] = []
+        self._flush_tasks = set()
     
     def _setup_handlers(self):
         """Setup bot command handlers."""
@@ -61,10 +282,14 @@ class TelegramBot:
             return
         
         logger.info("Starting Telegram bot polling")
-        self.bot.infinity_polling(none_stop=True, interval=1)
+        asyncio.run(self.bot.infinity_polling(timeout=LONG_POLL_TIMEOUT))
     
-    def send_message(self, text: str, chat_id: str = None, reply_markup=None):
-        """Send message to Telegram."""
+    async def send_message(self, text: str, chat_id: str = None, reply_markup=None, batch: bool = False):
+        """Send message to Telegram.
+        
+        With batch=True the message is buffered and sent together with other
+        notifications for the same chat after telegram_batch_flush_interval.
+        """
         if not self.bot:
             return False
         
@@ -73,14 +298,60 @@ class TelegramBot:
             logger.error("No chat ID provided for Telegram message")
             return False
         
+        if batch and reply_markup is None and settings.telegram_batch_enabled:
+            self._queue_message(target_chat_id, text)
+            return True
+        
         try:
-            self.bot.send_message(target_chat_id, text, reply_markup=reply_markup, parse_mode='HTML')
+            await self.bot.send_message(target_chat_id, text, reply_markup=reply_markup, parse_mode='HTML')
             return True
         except Exception as e:
             logger.error(f"Failed to send Telegram message: {e}")
             return False
     
-    def send_document(self, file_path: str, caption: str = "", chat_id: str = None):
+    def _queue_message(self, chat_id: str, text: str):
+        """Buffer a notification and schedule a flush for its chat."""
+        pending = self._outbox.setdefault(chat_id, [])
+        pending.append(text)
+        
+        if len(pending) >= settings.telegram_max_buffer_size:
+            self._spawn_flush(chat_id)
+        elif len(pending) == 1:
+            asyncio.get_running_loop().call_later(
+                settings.telegram_batch_flush_interval, self._spawn_flush, chat_id
+            )
+    
+    def _spawn_flush(self, chat_id: str):
+        """Start flushing a chat's buffer, keeping a reference to the task."""
+        task = asyncio.get_running_loop().create_task(self._flush(chat_id))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+    
+    async def _flush(self, chat_id: str):
+        """Send buffered notifications for a chat, one API call per chunk."""
+        pending = self._outbox.pop(chat_id, None)
+        if not pending:
+            return
+        
+        for chunk in _pack_messages(pending):
+            await self.send_message(chunk, chat_id)
+    
+    async def flush_pending(self):
+        """Send buffered notifications and the critical digest right away, e.g. before shutdown."""
+        if not self.bot:
+            return
+        
+        # Flushes already running on this loop; tasks of other loops cannot be awaited here
+        loop = asyncio.get_running_loop()
+        in_flight = [task for task in self._flush_tasks if task.get_loop() is loop]
+        
+        for chat_id in list(self._outbox):
+            await self._flush(chat_id)
+        await self._flush_critical()
+        if in_flight:
+            await asyncio.gather(*in_flight, return_exceptions=True)
+    
+    async def send_document(self, file_path: str, caption: str = "", chat_id: str = None):
         """Send document to Telegram."""
         if not self.bot:
             return False
@@ -90,65 +361,30 @@ class TelegramBot:
             return False
         
         try:
-            with open(file_path, 'rb') as doc:
-                self.bot.send_document(target_chat_id, doc, caption=caption)
+            # aiohttp streams the open file in chunks; only the open itself touches the disk here
+            doc = await asyncio.to_thread(open, file_path, 'rb')
+            with doc:
+                await self.bot.send_document(target_chat_id, doc, caption=caption)
             return True
         except Exception as e:
             logger.error(f"Failed to send document: {e}")
             return False
     
-    def _cmd_start(self, message):
+    async def _cmd_start(self, message):
         """Handle /start command."""
-        welcome_text = """
-🤖 <b>Ozon Ads Bot</b>
-
-Добро пожаловать! Я помогу вам управлять рекламными кампаниями на Ozon.
-
-<b>Доступные команды:</b>
-/help - список всех команд
-/status - статус системы
-/campaigns - список кампаний
-/analyze - анализ кампании
-/optimize - оптимизация кампании
-/report - генерация отчёта
-/schedule - управление расписанием
-/alerts - настройка уведомлений
-        """
-        self.send_message(welcome_text, str(message.chat.id))
+        await self.send_message(_WELCOME_TEXT, str(message.chat.id))
     
-    def _cmd_help(self, message):
+    async def _cmd_help(self, message):
         """Handle /help command."""
-        help_text = """
-<b>📋 Команды Ozon Ads Bot</b>
-
-<b>Основные:</b>
-/campaigns - показать все кампании
-/analyze - анализ эффективности
-/optimize - оптимизация кампаний
-/report - создать отчёт
-
-<b>Автоматизация:</b>
-/schedule - настроить расписание
-/alerts - уведомления о проблемах
-
-<b>Служебные:</b>
-/status - статус подключения
-/help - эта справка
-
-<b>💡 Быстрые действия:</b>
-• Используйте кнопки для удобного управления
-• Бот автоматически уведомляет о критических проблемах
-• Отчёты генерируются в Excel и PDF форматах
-        """
-        self.send_message(help_text, str(message.chat.id))
+        await self.send_message(_HELP_TEXT, str(message.chat.id))
     
-    def _cmd_status(self, message):
+    async def _cmd_status(self, message):
         """Handle /status command."""
         if not self.ozon_client:
             status_text = "❌ <b>Ozon API не подключен</b>"
         else:
             try:
-                campaigns = self.ozon_client.get_all_campaigns()
+                campaigns = await asyncio.to_thread(self.ozon_client.get_all_campaigns)
                 status_text = f"""
 ✅ <b>Система работает</b>
 
@@ -157,65 +393,63 @@ class TelegramBot:
 • API: подключен
 • Бот: активен
 
-🕐 <b>Последняя проверка:</b> {datetime.now().strftime('%d.%m.%Y %H:%M')}
+🕐 <b>Последняя проверка:</b> {_timestamp(datetime.now())}
                 """
             except Exception as e:
                 status_text = f"⚠️ <b>Ошибка подключения к API:</b> {str(e)}"
         
-        self.send_message(status_text, str(message.chat.id))
+        await self.send_message(status_text, str(message.chat.id))
     
-    def _cmd_campaigns(self, message):
+    async def _cmd_campaigns(self, message):
         """Handle /campaigns command."""
         if not self.ozon_client:
-            self.send_message("❌ Ozon API не подключен", str(message.chat.id))
+            await self.send_message("❌ Ozon API не подключен", str(message.chat.id))
             return
         
         try:
-            campaigns = self.ozon_client.get_all_campaigns()
+            campaigns = await asyncio.to_thread(self.ozon_client.get_all_campaigns)
             
             if not campaigns:
-                self.send_message("📭 Кампании не найдены", str(message.chat.id))
+                await self.send_message("📭 Кампании не найдены", str(message.chat.id))
                 return
             
             # Create inline keyboard for campaign selection
             markup = InlineKeyboardMarkup()
             
-            campaigns_text = "<b>📊 Ваши кампании:</b>\n\n"
+            parts = ["<b>📊 Ваши кампании:</b>\n\n"]
             
-            for i, campaign in enumerate(campaigns[:10]):  # Limit to 10
+            for campaign in campaigns[:10]:  # Limit to 10
                 campaign_id = str(campaign.get('id', ''))
                 campaign_name = campaign.get('name', 'Без названия')
                 status = campaign.get('status', 'unknown')
                 
-                status_emoji = "🟢" if status == "active" else "🔴" if status == "paused" else "⚪"
-                
-                campaigns_text += f"{status_emoji} <b>{campaign_name}</b>\n"
-                campaigns_text += f"   ID: {campaign_id}\n"
-                campaigns_text += f"   Статус: {status}\n\n"
+                parts.append(f"{_STATUS_EMOJI.get(status, '⚪')} <b>{campaign_name}</b>\n"
+                             f"   ID: {campaign_id}\n"
+                             f"   Статус: {status}\n\n")
                 
                 # Add button for quick analysis
                 markup.add(InlineKeyboardButton(
                     f"📈 Анализ: {campaign_name[:20]}...",
-                    callback_data=f"analyze_{campaign_id}"
+                    callback_data=f"{CB_ANALYZE}_{campaign_id}"
                 ))
             
-            self.send_message(campaigns_text, str(message.chat.id), markup)
+            await self.send_message("".join(parts), str(message.chat.id), markup)
             
         except Exception as e:
-            self.send_message(f"❌ Ошибка получения кампаний: {str(e)}", str(message.chat.id))
+            await self.send_message(f"❌ Ошибка получения кампаний: {str(e)}", str(message.chat.id))
     
-    def _cmd_analyze(self, message):
+    async def _cmd_analyze(self, message):
         """Handle /analyze command."""
         if not self.ozon_client or not self.analyzer:
-            self.send_message("❌ Компоненты анализа не подключены", str(message.chat.id))
+            await self.send_message("❌ Компоненты анализа не подключены", str(message.chat.id))
             return
         
         # Show campaign selection for analysis
         try:
-            campaigns = self.ozon_client.get_all_campaigns()
+            campaigns = await asyncio.to_thread(self.ozon_client.get_all_campaigns)
             
             if not campaigns:
-                self.send_message("📭 Кампании не найдены", str(message.chat.id))
+                await self.send_message("📭 Кампании не найдены", str(message.chat.id))
                 return
             
             markup = InlineKeyboardMarkup()
@@ -226,159 +460,106 @@ class TelegramBot:
                 
                 markup.add(InlineKeyboardButton(
                     f"🔍 {campaign_name[:30]}...",
-                    callback_data=f"analyze_{campaign_id}"
+                    callback_data=f"{CB_ANALYZE}_{campaign_id}"
                 ))
             
-            self.send_message(
+            await self.send_message(
                 "🔍 <b>Выберите кампанию для анализа:</b>", 
                 str(message.chat.id), 
                 markup
             )
             
         except Exception as e:
-            self.send_message(f"❌ Ошибка: {str(e)}", str(message.chat.id))
+            await self.send_message(f"❌ Ошибка: {str(e)}", str(message.chat.id))
     
-    def _cmd_optimize(self, message):
+    async def _cmd_optimize(self, message):
         """Handle /optimize command."""
         if not settings.auto_optimization_enabled:
-            self.send_message("⚠️ Автооптимизация отключена в настройках", str(message.chat.id))
+            await self.send_message("⚠️ Автооптимизация отключена в настройках", str(message.chat.id))
             return
         
         # Show optimization options
-        markup = InlineKeyboardMarkup()
-        markup.add(InlineKeyboardButton("🔴 Отключить неэффективные ключи", callback_data="opt_pause"))
-        markup.add(InlineKeyboardButton("📈 Скорректировать ставки", callback_data="opt_bids"))
-        markup.add(InlineKeyboardButton("🚀 Полная оптимизация", callback_data="opt_full"))
-        
-        self.send_message(
-            "⚙️ <b>Выберите тип оптимизации:</b>\n\n"
-            "🔴 <b>Отключение ключей</b> - отключает неэффективные ключевые слова\n"
-            "📈 <b>Ставки</b> - корректирует ставки по алгоритму\n"
-            "🚀 <b>Полная</b> - все действия сразу",
-            str(message.chat.id),
-            markup
-        )
+        await self.send_message(_OPTIMIZE_PROMPT, str(message.chat.id), _OPTIMIZE_MARKUP)
     
-    def _cmd_report(self, message):
+    async def _cmd_report(self, message):
         """Handle /report command."""
         if not self.report_generator:
-            self.send_message("❌ Генератор отчётов не подключен", str(message.chat.id))
+            await self.send_message("❌ Генератор отчётов не подключен", str(message.chat.id))
             return
         
         # Show report options
-        markup = InlineKeyboardMarkup()
-        markup.add(InlineKeyboardButton("📊 Excel отчёт", callback_data="report_excel"))
-        markup.add(InlineKeyboardButton("📄 PDF отчёт", callback_data="report_pdf"))
-        markup.add(InlineKeyboardButton("📈 Полный отчёт (Excel + PDF)", callback_data="report_full"))
-        
-        self.send_message(
-            "📋 <b>Выберите тип отчёта:</b>",
-            str(message.chat.id),
-            markup
-        )
+        await self.send_message("📋 <b>Выберите тип отчёта:</b>", str(message.chat.id), _REPORT_MARKUP)
     
-    def _cmd_schedule(self, message):
+    async def _cmd_schedule(self, message):
         """Handle /schedule command."""
         if not self.scheduler:
-            self.send_message("❌ Планировщик не подключен", str(message.chat.id))
+            await self.send_message("❌ Планировщик не подключен", str(message.chat.id))
             return
         
         jobs = self.scheduler.get_scheduled_jobs()
         
-        schedule_text = "<b>📅 Расписание задач:</b>\n\n"
+        parts = ["<b>📅 Расписание задач:</b>\n\n"]
         
         if not jobs:
-            schedule_text += "Нет запланированных задач"
+            parts.append("Нет запланированных задач")
         else:
             for job in jobs:
-                next_run = job.get('next_run_time', 'Не запланировано')
-                if next_run != 'Не запланировано':
-                    try:
-                        next_run = datetime.fromisoformat(next_run.replace('Z', '+00:00'))
-                        next_run = next_run.strftime('%d.%m.%Y %H:%M')
-                    except:
-                        pass
-                
-                schedule_text += f"🔧 <b>{job['name']}</b>\n"
-                schedule_text += f"   Следующий запуск: {next_run}\n\n"
+                next_run = job.get('next_run_display') or 'Не запланировано'
+                parts.append(f"🔧 <b>{job['name']}</b>\n"
+                             f"   Следующий запуск: {next_run}\n\n")
         
         # Add control buttons
-        markup = InlineKeyboardMarkup()
-        markup.add(InlineKeyboardButton("▶️ Запустить анализ", callback_data="run_analysis"))
-        markup.add(InlineKeyboardButton("📊 Создать отчёт", callback_data="run_report"))
-        
-        self.send_message(schedule_text, str(message.chat.id), markup)
+        await self.send_message("".join(parts), str(message.chat.id), _SCHEDULE_MARKUP)
     
-    def _cmd_alerts(self, message):
+    async def _cmd_alerts(self, message):
         """Handle /alerts command."""
-        alerts_text = """
-🔔 <b>Настройка уведомлений</b>
-
-<b>Автоматические уведомления:</b>
-• ДРР > 50% - критический уровень
-• Расходы > 10,000₽ в день
-• Ключи без заказов при >30 кликах
-• Завершение автооптимизации
-
-<b>Еженедельные отчёты:</b>
-• Понедельник в 10:00
-• Сводка по всем кампаниям
-• Рекомендации по оптимизации
-
-Уведомления приходят автоматически при обнаружении проблем.
-        """
-        
-        self.send_message(alerts_text, str(message.chat.id))
+        await self.send_message(_ALERTS_TEXT, str(message.chat.id))
     
-    def _handle_callback(self, call):
+    async def _handle_callback(self, call):
         """Handle inline keyboard callbacks."""
         chat_id = str(call.message.chat.id)
         data = call.data
         
+        # Acknowledge right away so the button stops spinning while the action runs
+        task = asyncio.get_running_loop().create_task(self._ack_callback(call.id))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+        
         try:
-            if data.startswith("analyze_"):
-                campaign_id = data.replace("analyze_", "")
-                self._analyze_campaign(campaign_id, chat_id)
-            
-            elif data.startswith("opt_"):
-                optimization_type = data.replace("opt_", "")
-                self._run_optimization(optimization_type, chat_id)
-            
-            elif data.startswith("report_"):
-                report_type = data.replace("report_", "")
-                self._generate_report(report_type, chat_id)
-            
-            elif data == "run_analysis":
-                self._run_manual_analysis(chat_id)
-            
-            elif data == "run_report":
-                self._generate_report("excel", chat_id)
-            
-            # Acknowledge callback
-            self.bot.answer_callback_query(call.id)
+            handler = self._callback_handlers.get(data)
+            arg = ""
+            if handler is None:
+                prefix, _, arg = data.partition("_")
+                handler = self._callback_handlers.get(prefix)
+            if handler is not None:
+                await handler(arg, chat_id)
             
         except Exception as e:
             logger.error(f"Callback error: {e}")
-            self.bot.answer_callback_query(call.id, "❌ Произошла ошибка")
+            await self.send_message("❌ Произошла ошибка", chat_id)
     
-    def _analyze_campaign(self, campaign_id: str, chat_id: str):
+    async def _ack_callback(self, call_id: str):
+        """Answer a callback query, ignoring failures."""
+        try:
+            await self.bot.answer_callback_query(call_id)
+        except Exception as e:
+            logger.warning(f"Failed to answer callback query: {e}")
+    
+    async def _analyze_campaign(self, campaign_id: int, chat_id: str):
         """Analyze specific campaign."""
-        self.send_message("🔍 <b>Анализирую кампанию...</b>", chat_id)
+        await self.send_message("🔍 <b>Анализирую кампанию...</b>", chat_id)
         
         try:
-            date_to = datetime.now().strftime('%Y-%m-%d')
-            date_from = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
+            date_from, date_to = _analysis_period()
             
             # Get data
-            stats = self.ozon_client.get_campaign_stats(campaign_id, date_from, date_to)
-            keyword_stats = self.ozon_client.get_keyword_stats(campaign_id, date_from, date_to)
+            stats, keyword_stats = await self._fetch_campaign_data(campaign_id, date_from, date_to)
             
-            # Analyze
-            analysis = self.analyzer.analyze_keywords(keyword_stats)
-            summary = self.analyzer.get_campaign_summary(stats, analysis)
+            # Analyze off the event loop
+            analysis, summary = await asyncio.to_thread(self._analyze, stats, keyword_stats)
             
             # Format results
-            result_text = f"""
+            parts = [f"""
 📊 <b>Анализ кампании {campaign_id}</b>
 
 <b>💰 Показатели за 7 дней:</b>
@@ -388,86 +569,97 @@ class TelegramBot:
 • ДРР: {summary['performance_metrics']['overall_drr']:.2f}%
 
 <b>🎯 Необходимые действия:</b>
-            """
+            """]
             
             actions = summary.get('actions_needed', {})
             if actions.get('pause', 0) > 0:
-                result_text += f"• 🔴 Отключить: {actions['pause']} ключей\n"
+                parts.append(f"• 🔴 Отключить: {actions['pause']} ключей\n")
             if actions.get('increase_bid', 0) > 0:
-                result_text += f"• 📈 Повысить ставки: {actions['increase_bid']} ключей\n"
+                parts.append(f"• 📈 Повысить ставки: {actions['increase_bid']} ключей\n")
             if actions.get('decrease_bid', 0) > 0:
-                result_text += f"• 📉 Понизить ставки: {actions['decrease_bid']} ключей\n"
+                parts.append(f"• 📉 Понизить ставки: {actions['decrease_bid']} ключей\n")
             
             # Critical issues
             critical_issues = summary.get('critical_issues', [])
             if critical_issues:
-                result_text += f"\n⚠️ <b>Критические проблемы:</b>\n"
-                for issue in critical_issues[:3]:  # Top 3
-                    result_text += f"• {issue['keyword']}: {issue['recommendation']}\n"
+                parts.append("\n⚠️ <b>Критические проблемы:</b>\n")
+                parts.extend(f"• {issue['keyword']}: {issue['recommendation']}\n"
+                             for issue in critical_issues[:3])  # Top 3
             
-            self.send_message(result_text, chat_id)
+            await self.send_message("".join(parts), chat_id)
             
         except Exception as e:
-            self.send_message(f"❌ Ошибка анализа: {str(e)}", chat_id)
+            await self.send_message(f"❌ Ошибка анализа: {str(e)}", chat_id)
+    
+    async def _fetch_campaign_data(self, campaign_id: int, date_from: str, date_to: str):
+        """Fetch campaign and keyword stats concurrently."""
+        return await asyncio.gather(
+            asyncio.to_thread(self.ozon_client.get_campaign_stats, campaign_id, date_from, date_to),
+            asyncio.to_thread(self.ozon_client.get_keyword_stats, campaign_id, date_from, date_to)
+        )
+    
+    def _analyze(self, stats: Dict, keyword_stats: List[Dict]):
+        """Analyze keywords and build the campaign summary (blocking)."""
+        analysis = self.analyzer.analyze_keywords(keyword_stats)
+        return analysis, self.analyzer.get_campaign_summary(stats, analysis)
     
-    def _run_optimization(self, optimization_type: str, chat_id: str):
+    async def _run_optimization(self, optimization_type: str, chat_id: str):
         """Run optimization based on type."""
         if not settings.auto_optimization_enabled:
-            self.send_message("⚠️ Автооптимизация отключена", chat_id)
+            await self.send_message("⚠️ Автооптимизация отключена", chat_id)
             return
         
-        self.send_message("⚙️ <b>Запускаю оптимизацию...</b>", chat_id)
+        await self.send_message("⚙️ <b>Запускаю оптимизацию...</b>", chat_id)
         
         # This would trigger actual optimization
         # For now, just show confirmation
-        self.send_message(
+        await self.send_message(
             f"✅ <b>Оптимизация запущена</b>\n\n"
             f"Тип: {optimization_type}\n"
             f"Результаты будут отправлены по завершении.",
             chat_id
         )
     
-    def _generate_report(self, report_type: str, chat_id: str):
+    async def _generate_report(self, report_type: str, chat_id: str):
         """Generate and send report."""
-        self.send_message("📊 <b>Генерирую отчёт...</b>", chat_id)
+        await self.send_message("📊 <b>Генерирую отчёт...</b>", chat_id)
         
         try:
             # Get first campaign for demo
-            campaigns = self.ozon_client.get_all_campaigns()
+            campaigns = await asyncio.to_thread(self.ozon_client.get_all_campaigns)
             if not campaigns:
-                self.send_message("❌ Кампании не найдены", chat_id)
+                await self.send_message("❌ Кампании не найдены", chat_id)
                 return
             
-            campaign_id = str(campaigns[0].get('id', ''))
-            date_to = datetime.now().strftime('%Y-%m-%d')
-            date_from = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
+            campaign_id = int(campaigns[0].get('id', 0))
+            date_from, date_to = _analysis_period()
             
             # Get data and analyze
-            stats = self.ozon_client.get_campaign_stats(campaign_id, date_from, date_to)
-            keyword_stats = self.ozon_client.get_keyword_stats(campaign_id, date_from, date_to)
-            analysis = self.analyzer.analyze_keywords(keyword_stats)
-            summary = self.analyzer.get_campaign_summary(stats, analysis)
+            stats, keyword_stats = await self._fetch_campaign_data(campaign_id, date_from, date_to)
+            analysis, summary = await asyncio.to_thread(self._analyze, stats, keyword_stats)
             
-            # Generate report
-            if report_type in ["excel", "full"]:
-                excel_path = self.report_generator.generate_excel_report(summary, analysis)
-                self.send_document(excel_path, "📊 Excel отчёт по кампании", chat_id)
+            # Generate report off the event loop
+            if report_type in _REPORT_EXCEL_TYPES:
+                async with self._report_sem:
+                    excel_path = await asyncio.to_thread(self.report_generator.generate_excel_report, summary, analysis)
+                await self.send_document(excel_path, "📊 Excel отчёт по кампании", chat_id)
             
-            if report_type in ["pdf", "full"]:
-                pdf_path = self.report_generator.generate_pdf_report(summary)
-                self.send_document(pdf_path, "📄 PDF отчёт по кампании", chat_id)
+            if report_type in _REPORT_PDF_TYPES:
+                async with self._report_sem:
+                    pdf_path = await asyncio.to_thread(self.report_generator.generate_pdf_report, summary)
+                await self.send_document(pdf_path, "📄 PDF отчёт по кампании", chat_id)
             
-            self.send_message("✅ <b>Отчёт готов!</b>", chat_id)
+            await self.send_message("✅ <b>Отчёт готов!</b>", chat_id)
             
         except Exception as e:
-            self.send_message(f"❌ Ошибка генерации отчёта: {str(e)}", chat_id)
+            await self.send_message(f"❌ Ошибка генерации отчёта: {str(e)}", chat_id)
     
-    def _run_manual_analysis(self, chat_id: str):
+    async def _run_manual_analysis(self, chat_id: str):
         """Run manual analysis for all campaigns."""
-        self.send_message("🔍 <b>Запускаю анализ всех кампаний...</b>", chat_id)
+        await self.send_message("🔍 <b>Запускаю анализ всех кампаний...</b>", chat_id)
         
         # This would trigger the scheduler's analysis
-        self.send_message(
+        await self.send_message(
             "✅ <b>Анализ запущен</b>\n\n"
             "Результаты будут отправлены по завершении.",
             chat_id
@@ -480,7 +672,7 @@ class TelegramBot:
             return
         
         total_campaigns = len(results)
-        critical_issues = sum(len([k for k in r['analysis'] if k.get('priority', 0) >= 90]) for r in results)
+        critical_issues = sum(k.get('priority', 0) >= 90 for r in results for k in r['analysis'])
         
         message = f"""
 📊 <b>Анализ завершён</b>
@@ -488,10 +680,10 @@ class TelegramBot:
 • Проанализировано кампаний: {total_campaigns}
 • Найдено критических проблем: {critical_issues}
 
-{datetime.now().strftime('%d.%m.%Y %H:%M')}
+{_timestamp(datetime.now())}
         """
         
-        self.send_message(message)
+        await self.send_message(message, batch=True)
     
     async def notify_optimization_complete(self, results: List[Dict]):
         """Notify about completed optimization."""
@@ -508,28 +700,65 @@ class TelegramBot:
 • Отключено ключей: {total_paused}
 • Обработано кампаний: {len(results)}
 
-{datetime.now().strftime('%d.%m.%Y %H:%M')}
+{_timestamp(datetime.now())}
         """
         
-        self.send_message(message)
+        await self.send_message(message, batch=True)
     
-    async def notify_critical_issue(self, campaign_id: str, issues: List[Dict]):
-        """Notify about critical issues."""
+    async def notify_monitoring_alerts(self, alerts: List[Dict]):
+        """Notify about monitoring alerts."""
         if not self.bot or not self.chat_id:
             return
         
-        message = f"""
-🚨 <b>КРИТИЧЕСКАЯ ПРОБЛЕМА</b>
+        parts = [f"""
+🔔 <b>Мониторинг кампаний</b>
 
-Кампания: {campaign_id}
-Проблем найдено: {len(issues)}
+Оповещений: {len(alerts)}
 
-<b>Топ проблемы:</b>
-        """
+"""]
+        
+        for alert in alerts[:10]:
+            icon = '🚨' if alert['severity'] == 'critical' else '⚠️'
+            parts.append(f"{icon} Кампания {alert['campaign_id']}: {alert['message']}\n")
         
-        for issue in issues[:3]:
-            message += f"• {issue['keyword']}: {issue['recommendation']}\n"
+        parts.append(f"\n⏰ {_timestamp(datetime.now())}")
         
-        message += f"\n⏰ {datetime.now().strftime('%d.%m.%Y %H:%M')}"
+        await self.send_message("".join(parts), batch=True)
+    
+    async def notify_critical_issue(self, campaign_id: int, issues: List[Dict]):
+        """Notify about critical issues, coalescing bursts into one digest."""
+        if not self.bot or not self.chat_id:
+            return
         
-        self.send_message(message)
\ No newline at end of file
+        self._critical_buffer.append((campaign_id, issues))
+        if len(self._critical_buffer) == 1:
+            # Short window: urgent, so not subject to telegram_batch_flush_interval
+            asyncio.get_running_loop().call_later(CRITICAL_DIGEST_WINDOW, self._spawn_critical_flush)
+    
+    def _spawn_critical_flush(self):
+        """Start sending the critical digest, keeping a reference to the task."""
+        task = asyncio.get_running_loop().create_task(self._flush_critical())
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+    
+    async def _flush_critical(self):
+        """Send buffered critical issues as a single digest."""
+        pending, self._critical_buffer = self._critical_buffer, []
+        if not pending:
+            return
+        
+        if len(pending) == 1:
+            sections = ["🚨 <b>КРИТИЧЕСКАЯ ПРОБЛЕМА</b>"]
+        else:
+            sections = [f"🚨 <b>КРИТИЧЕСКИЕ ПРОБЛЕМЫ</b>\n\nКампаний: {len(pending)}"]
+        sections.extend(_format_critical_issue(campaign_id, issues)
+                        for campaign_id, issues in pending[:CRITICAL_DIGEST_MAX_CAMPAIGNS])
+        
+        overflow = len(pending) - CRITICAL_DIGEST_MAX_CAMPAIGNS
+        if overflow > 0:
+            sections.append(f"… и ещё кампаний: {overflow}")
+        sections.append(f"⏰ {_timestamp(datetime.now())}")
+        
+        # Split only between campaign sections so HTML tags stay balanced
+        for chunk in _pack_messages(sections):
+            await self.send_message(chunk)
\ No newline at end of file